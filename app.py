@@ -1,12 +1,61 @@
 from helpers.application import app, api
 from helpers.CORS import cors
+import helpers.reconcile  # registra o comando `flask solr-reconcile`
+import helpers.profiling  # perfis sob demanda (PROFILING_ENABLED); antes do cache HTTP para medir tudo
+import helpers.http_cache  # ETag/304 e compressão das respostas
 
 from resources.IndexResource import IndexResource
+from resources.MetricsResource import MetricsResource
+from resources.StatusResource import StatusResource
 from resources.CBOResouce import CbosResouce, CboResouce
+from resources.CBOBulkResource import CbosBulkResource
+from resources.CBOExportResource import CbosExportResource
+from resources.CBOLookupResource import CbosLookupResource
+from resources.CBOFacetsResource import CbosFacetsResource
+from resources.CBOSuggestResource import CbosSuggestResource
+from resources.ProfilesResource import ProfilesResource, ProfileResource
 
 cors.init_app(app)
 
 api.add_resource(IndexResource, '/')
+api.add_resource(StatusResource, '/status')
+api.add_resource(MetricsResource, '/metrics')
 
 api.add_resource(CbosResouce, '/cbos')
-api.add_resource(CboResouce, '/cbo/<int:cod_cbo>')
\ No newline at end of file
+api.add_resource(CbosBulkResource, '/cbos/bulk')
+api.add_resource(CbosExportResource, '/cbos/export')
+api.add_resource(CbosLookupResource, '/cbos/lookup')
+api.add_resource(CbosFacetsResource, '/cbos/facets')
+api.add_resource(CbosSuggestResource, '/cbos/suggest')
+api.add_resource(CboResouce, '/cbo/<int:cod_cbo>')
+
+if helpers.profiling.PROFILING_ENABLED:
+    api.add_resource(ProfilesResource, '/profiles')
+    api.add_resource(ProfileResource, '/profiles/<string:perfil_id>')
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:
+    postfork = None
+
+if postfork is not None:
+    from helpers.indexer import indexador, SOLR_INDEXER_EMBEDDED
+    from helpers.search import indice, SEARCH_BACKEND
+    from helpers.logging import log_exception
+
+    @postfork
+    def iniciar_indexador():
+        """Cada worker drena a outbox; o SKIP LOCKED evita trabalho duplicado."""
+        if SOLR_INDEXER_EMBEDDED:
+            indexador.iniciar()
+
+    @postfork
+    def carregar_indice_busca():
+        """Constrói o índice de busca local em cada worker do uWSGI."""
+        if SEARCH_BACKEND == "solr":
+            return
+        try:
+            with app.app_context():
+                indice.carregar()
+        except Exception:
+            log_exception("Falha ao carregar o índice de busca local; será carregado sob demanda")
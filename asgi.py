@@ -0,0 +1,369 @@
+"""Modo de atendimento assíncrono (ASGI) das rotas de `/cbos` e `/cbo/<cod_cbo>`.
+
+Alternativa ao `app.py` (uWSGI) para tráfego de busca limitado pelo Solr:
+cada requisição esperando o Solr ou o banco é só uma corrotina, então um
+processo segura centenas de buscas simultâneas em vez de 2 threads.
+
+    hypercorn asgi:app --bind 0.0.0.0:5001
+
+Usa httpx (Solr), SQLAlchemy assíncrono (asyncpg/aiosqlite) e o mesmo
+formato de resposta, paginação, filtros e outbox do modo WSGI. A indexação
+no Solr continua sendo feita a partir da outbox (`flask solr-indexer` ou os
+workers do uWSGI); os caches e o índice de busca locais não são usados aqui.
+"""
+import asyncio
+import os
+import time
+from functools import wraps
+
+import httpx
+from quart import Quart, Response, abort, request
+from sqlalchemy import func, select, true, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from dotenv import load_dotenv
+
+from helpers.cache import versao_dataset
+from helpers.hierarchy import faixa_grupo
+from helpers.logging import logger, log_exception
+from helpers.metrics import observar_solr, observar_disjuntor
+from helpers.pagination import codificar_cursor, decodificar_cursor, CursorInvalido
+from helpers.serialization import codificar
+from helpers.solr import (SOLR_CONNECT_TIMEOUT, SOLR_READ_TIMEOUT, SOLR_RETRIES,
+                          SOLR_SEARCH_DEADLINE, SolrIndisponivel, solr, parametros_busca, resultado_busca)
+
+from models.CBO import serializar_cbo, CBO
+from models.SolrOutbox import SolrOutbox
+from resources.CBOLookupResource import codigos_da_query, validar_codigos
+from resources.CBOResouce import MAX_PER_PAGE
+
+load_dotenv()
+
+# Requisições atendidas ao mesmo tempo; as demais esperam até ASYNC_QUEUE_TIMEOUT e recebem 503
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", 500))
+ASYNC_QUEUE_TIMEOUT = float(os.getenv("ASYNC_QUEUE_TIMEOUT", 5))
+ASYNC_SOLR_MAX_CONNECTIONS = int(os.getenv("ASYNC_SOLR_MAX_CONNECTIONS", 100))
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", 10))
+
+DRIVERS_ASSINCRONOS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def url_assincrona(url: str) -> str:
+    """Troca o driver síncrono da URL do banco pelo equivalente assíncrono."""
+    url = make_url(url)
+    return url.set(drivername=DRIVERS_ASSINCRONOS.get(url.get_backend_name(), url.drivername)).render_as_string(
+        hide_password=False)
+
+
+app = Quart(__name__)
+
+url_banco = url_assincrona(os.getenv("ASYNC_DATABASE_URI") or os.environ["SQLALCHEMY_DATABASE_URI"])
+engine = create_async_engine(
+    url_banco, **({} if url_banco.startswith("sqlite") else {"pool_size": ASYNC_DB_POOL_SIZE})
+)
+Sessao = async_sessionmaker(engine, expire_on_commit=False)
+
+limite = asyncio.Semaphore(ASYNC_MAX_IN_FLIGHT)
+solr_cliente: httpx.AsyncClient = None
+
+
+@app.before_serving
+async def _abrir_solr():
+    global solr_cliente
+    solr_cliente = httpx.AsyncClient(
+        timeout=httpx.Timeout(SOLR_READ_TIMEOUT, connect=SOLR_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=ASYNC_SOLR_MAX_CONNECTIONS,
+                            max_keepalive_connections=ASYNC_SOLR_MAX_CONNECTIONS),
+        transport=httpx.AsyncHTTPTransport(retries=SOLR_RETRIES)
+    )
+
+
+@app.after_serving
+async def _fechar_solr():
+    await solr_cliente.aclose()
+    await engine.dispose()
+
+
+def _json(dados, status: int = 200) -> Response:
+    return Response(codificar(dados) + b"\n", status=status, mimetype="application/json")
+
+
+@app.errorhandler(HTTPException)
+async def _erro_http(e):
+    # Mesmo corpo de erro do Flask-RESTful, mantendo cabeçalhos como o Retry-After
+    resposta = _json({"message": e.description}, e.code)
+    for nome, valor in e.get_headers():
+        if nome.lower() != "content-type":
+            resposta.headers[nome] = valor
+    return resposta
+
+
+def limitado(view):
+    """Limita as requisições em andamento a ASYNC_MAX_IN_FLIGHT."""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        try:
+            # Sem wait_for: cancelado depois de adquirir, ele perderia a vaga para sempre
+            async with asyncio.timeout(ASYNC_QUEUE_TIMEOUT):
+                await limite.acquire()
+        except TimeoutError:
+            logger.warning("Limite de requisições simultâneas atingido")
+            abort(503, description="Servidor sobrecarregado, tente novamente.")
+        try:
+            return await view(*args, **kwargs)
+        finally:
+            limite.release()
+    return wrapper
+
+
+def _cursor(token: str, chave: str) -> dict:
+    try:
+        return decodificar_cursor(token, chave)
+    except CursorInvalido as e:
+        abort(400, description=str(e))
+
+
+@app.get("/cbos")
+@limitado
+async def listar_cbos():
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 100)), 1), MAX_PER_PAGE)
+    except ValueError:
+        abort(400, description="Parâmetros de paginação inválidos.")
+    search_query = request.args.get('q', "").strip()
+    grupo = request.args.get('grupo', "").strip()
+    codes = request.args.get('codes')
+
+    faixa = None
+    if grupo:
+        try:
+            faixa = faixa_grupo(grupo)
+        except ValueError as e:
+            abort(400, description=str(e))
+
+    if codes is not None:
+        return await _buscar_por_codigos(validar_codigos(codigos_da_query(codes)))
+    if search_query:
+        return await _buscar_solr(search_query, grupo, faixa, page, per_page)
+    return await _listar(grupo, faixa, page, per_page)
+
+
+async def _buscar_solr(search_query, grupo, faixa, page, per_page):
+    chave = " ".join(search_query.lower().split())
+    if grupo:
+        chave += f" grupo:{grupo}"
+    cursor = request.args.get('cursor')
+    posicao = _cursor(cursor, chave) if cursor else None
+    if posicao and "m" not in posicao:
+        # Cursor do índice local (app WSGI em fallback); aqui só há o Solr
+        abort(400, description="Cursor emitido por outro backend de busca; recomece com cursor=*.")
+
+    logger.info(f"Busca Solr (async): '{search_query}'")
+    params = parametros_busca(search_query, page, per_page, posicao, faixa)
+    try:
+        dados = await _consultar_solr(params)
+    except (SolrIndisponivel, TimeoutError) as e:
+        # Disjuntor aberto ou prazo esgotado: sem índice local aqui, só resta o 503
+        logger.warning(f"Busca Solr recusada: {str(e) or f'prazo de {SOLR_SEARCH_DEADLINE}s esgotado'}")
+        restante = solr.breaker.restante_aberto() if solr.breaker is not None else 0.0
+        abort(503, description="Serviço de busca (Solr) indisponível.", retry_after=max(int(restante + 0.999), 1))
+    except httpx.HTTPError as e:
+        log_exception(f"Erro de conexão/requisição Solr: {e}")
+        abort(503, description="Serviço de busca (Solr) indisponível.")
+    return _json(resultado_busca(dados, params, chave, page, per_page, posicao))
+
+
+async def _consultar_solr(params: dict) -> dict:
+    """Consulta o /select de uma réplica do mesmo `ReplicaSet` do modo WSGI.
+
+    Como em `SolrClient.select`: se a réplica falhar, repete uma vez em outra,
+    dentro do prazo total SOLR_SEARCH_DEADLINE.
+    """
+    replicas = solr.replicas
+    limite = time.monotonic() + SOLR_SEARCH_DEADLINE
+    tentadas = []
+    while True:
+        replica = replicas.escolher(excluir=tentadas)
+        tentadas.append(replica)
+        inicio = time.perf_counter()
+        try:
+            resposta = await _get_solr(replica.url, params, max(limite - time.monotonic(), 0.001))
+        except (SolrIndisponivel, asyncio.CancelledError):
+            replicas.liberar(replica)
+            raise
+        except (httpx.HTTPError, TimeoutError):
+            replicas.concluir(replica, time.perf_counter() - inicio, False)
+            if not _outra_replica(tentadas, limite):
+                raise
+            continue
+        falhou = resposta.status_code >= 500
+        replicas.concluir(replica, time.perf_counter() - inicio, not falhou)
+        if falhou and _outra_replica(tentadas, limite):
+            continue
+        resposta.raise_for_status()
+        return resposta.json()
+
+
+def _outra_replica(tentadas: list, limite: float) -> bool:
+    # No máximo uma nova tentativa, em outra réplica e só se ainda houver prazo
+    return len(tentadas) < min(2, len(solr.replicas.replicas)) and time.monotonic() < limite
+
+
+async def _get_solr(url: str, params: dict, prazo: float) -> httpx.Response:
+    """Uma chamada ao Solr pelo mesmo disjuntor do modo WSGI, limitada a `prazo` segundos."""
+    breaker = solr.breaker
+    ficha = breaker.permitir() if breaker is not None else None
+    if breaker is not None and ficha is None:
+        observar_disjuntor(breaker.estado, recusada=True)
+        restante = breaker.restante_aberto()
+        raise SolrIndisponivel(f"Disjuntor do Solr aberto (próxima tentativa em {restante:.1f}s)",
+                               retry_after=restante)
+
+    inicio = time.perf_counter()
+    erro = falha = True
+    try:
+        resposta = await asyncio.wait_for(solr_cliente.get(url, params={**params, "wt": "json"}), prazo)
+        erro = resposta.status_code >= 400
+        falha = resposta.status_code >= 500
+        return resposta
+    finally:
+        duracao = time.perf_counter() - inicio
+        observar_solr("GET", url, duracao, erro)
+        if breaker is not None:
+            breaker.registrar(ficha, falha, duracao)
+            observar_disjuntor(breaker.estado)
+
+
+async def _listar(grupo, faixa, page, per_page):
+    after = request.args.get('after')
+    posicao = _cursor(after, grupo) if after else None
+    if posicao and not {"t", "c"} <= posicao.keys():
+        abort(400, description="Cursor inválido.")
+
+    filtro = CBO.cod_cbo.between(*faixa) if faixa else true()
+    consulta = select(CBO).where(filtro).order_by(CBO.titulo.asc(), CBO.cod_cbo.asc()).limit(per_page)
+    if posicao:
+        consulta = consulta.where(tuple_(CBO.titulo, CBO.cod_cbo) > (posicao["t"], posicao["c"]))
+    elif posicao is None:
+        consulta = consulta.offset((page - 1) * per_page)
+
+    try:
+        async with Sessao() as sessao:
+            total = await sessao.scalar(select(func.count()).select_from(CBO).where(filtro))
+            cbos = serializar_cbo((await sessao.scalars(consulta)).all())
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao buscar CBOs.")
+        abort(500, description="Problema com o banco de dados.")
+
+    if not cbos:
+        return _json({
+            "mensagem": "Nenhum CBO(Classificação Brasileira de Ocupações) encontrado.",
+            "cbos": [],
+            "total": 0
+        }, 404)
+
+    ultimo = cbos[-1]
+    resultado = {
+        "CBOs": cbos,
+        "per_page": per_page,
+        "total": total,
+        "next_after": (codificar_cursor(grupo, t=ultimo["titulo"], c=ultimo["cod_cbo"])
+                       if len(cbos) == per_page else None)
+    }
+    if posicao is None:
+        resultado["page"] = page
+    return _json(resultado)
+
+
+async def _buscar_por_codigos(codigos):
+    # `codigos` já validados (inteiros, sem repetição e dentro do limite), como no modo WSGI
+    try:
+        async with Sessao() as sessao:
+            encontradas = {cbo.cod_cbo: cbo for cbo in await sessao.scalars(
+                select(CBO).where(CBO.cod_cbo.in_(codigos)))}
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao buscar CBOs por códigos.")
+        abort(500, description="Problema com o banco de dados.")
+    return _json({
+        "CBOs": serializar_cbo([encontradas[c] for c in codigos if c in encontradas]),
+        "nao_encontrados": [c for c in codigos if c not in encontradas]
+    })
+
+
+@app.post("/cbos")
+@limitado
+async def criar_cbo():
+    dados = await request.get_json()
+    try:
+        async with Sessao() as sessao, sessao.begin():
+            nova_cbo = CBO(**dados)
+            sessao.add(nova_cbo)
+            await sessao.flush()
+            # A indexação no Solr é feita pelo indexador a partir da outbox
+            sessao.add(SolrOutbox(cod_cbo=nova_cbo.cod_cbo, operacao="upsert"))
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao inserir nova CBO.")
+        abort(500, description="Problema com o banco de dados.")
+    versao_dataset.incrementar()
+    logger.info(f"Nova CBO com codigo {nova_cbo.cod_cbo} cadastrada com sucesso")
+    return _json(serializar_cbo(nova_cbo), 201)
+
+
+@app.get("/cbo/<int:cod_cbo>")
+@limitado
+async def obter_cbo(cod_cbo):
+    try:
+        async with Sessao() as sessao:
+            cbo = await sessao.get(CBO, cod_cbo)
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao buscar cbo por código.")
+        abort(500, description="Problema com o banco de dados.")
+    if cbo is None:
+        return _json({"mensagem": "CBO não encontrada."}, 404)
+    return _json(serializar_cbo(cbo))
+
+
+@app.put("/cbo/<int:cod_cbo>")
+@limitado
+async def atualizar_cbo(cod_cbo):
+    dados = await request.get_json()
+    try:
+        async with Sessao() as sessao, sessao.begin():
+            cbo = await sessao.get(CBO, cod_cbo, with_for_update=True)
+            if cbo is None:
+                return _json({"mensagem": "CBO não encontrada."}, 404)
+            alterados = {chave: valor for chave, valor in dados.items()
+                         if hasattr(cbo, chave) and getattr(cbo, chave) != valor}
+            if not alterados:
+                return _json({"mensagem": "Nenhuma alteração necessária."})
+            for chave, valor in alterados.items():
+                setattr(cbo, chave, valor)
+            sessao.add(SolrOutbox(cod_cbo=cod_cbo, operacao="upsert"))
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao atualizar CBO.")
+        abort(500, description="Problema com o banco de dados.")
+    versao_dataset.incrementar()
+    logger.info(f"CBO com código {cod_cbo} atualizada com sucesso.")
+    return _json({"mensagem": "CBO atualizada com sucesso."})
+
+
+@app.delete("/cbo/<int:cod_cbo>")
+@limitado
+async def remover_cbo(cod_cbo):
+    try:
+        async with Sessao() as sessao, sessao.begin():
+            cbo = await sessao.get(CBO, cod_cbo)
+            if cbo is None:
+                return _json({"mensagem": "CBO não encontrada."}, 404)
+            await sessao.delete(cbo)
+            sessao.add(SolrOutbox(cod_cbo=cod_cbo, operacao="delete"))
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao deletar CBO.")
+        abort(500, description="Problema com o banco de dados.")
+    versao_dataset.incrementar()
+    logger.info(f"CBO com código {cod_cbo} removida com sucesso.")
+    return _json({"mensagem": "CBO removida com sucesso."})
@@ -0,0 +1,203 @@
+"""Solr falso em memória para benchmarks e testes locais.
+
+Imita o suficiente de `/select`, `/update` e `/admin/ping` de um core para a
+API funcionar: busca por termos em `titulo`, filtros `fq` por faixa de
+`cod_cbo`, `rows`/`start`, `cursorMark`, JSON Facet por faixa (contagem e
+`sum`) e comandos JSON de add/delete/commit. A latência de cada resposta é configurável.
+
+Várias instâncias podem compartilhar o mesmo estado, como réplicas de um
+core com replicação instantânea; com `capacidade`, cada instância atende
+no máximo essa quantidade de requisições ao mesmo tempo (as demais esperam),
+o que imita um nó com CPU limitada.
+
+Uso isolado:
+    python -m bench.fake_solr --port 8983 --latency-ms 5 [--replicas 3 --capacity 4]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import unicodedata
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FAIXA_RE = re.compile(r"cod_cbo:\[(\S+) TO (\S+)\]")
+TERMO_RE = re.compile(r"\w+")
+SOMA_RE = re.compile(r"sum\((\w+)\)")
+
+
+def _dobrar(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+class FakeSolr:
+    """Estado do core falso: documentos por id, latência e contadores."""
+
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self.documentos = {}
+        self.lock = threading.Lock()
+        self.selects = 0
+        self.updates = 0
+
+    def select(self, params: dict) -> dict:
+        with self.lock:
+            self.selects += 1
+            docs = sorted(self.documentos.values(), key=lambda d: d["id"])
+
+        for fq in params.get("fq", []):
+            faixa = FAIXA_RE.search(fq)
+            if faixa:
+                inicio = float("-inf") if faixa[1] == "*" else int(faixa[1])
+                fim = float("inf") if faixa[2] == "*" else int(faixa[2])
+                docs = [d for d in docs if inicio <= d["cod_cbo"] <= fim]
+
+        consulta = params.get("q", ["*:*"])[0]
+        if consulta != "*:*":
+            termos = [t for t in TERMO_RE.findall(_dobrar(consulta)) if t not in ("titulo", "and", "or")]
+            pontuados = []
+            for doc in docs:
+                titulo = _dobrar(doc["titulo"])
+                pontos = sum(1 for t in termos if t in titulo)
+                if pontos:
+                    pontuados.append((-pontos, doc["id"], doc))
+            docs = [doc for _, _, doc in sorted(pontuados, key=lambda item: item[:2])]
+
+        rows = int(params.get("rows", ["10"])[0])
+        campos = [c.strip() for c in params.get("fl", ["*"])[0].split(",")]
+        resposta = {"responseHeader": {"status": 0}, "response": {"numFound": len(docs)}}
+
+        if "cursorMark" in params:
+            marca = params["cursorMark"][0]
+            inicio = 0 if marca == "*" else int(marca)
+            pagina = docs[inicio:inicio + rows]
+            resposta["nextCursorMark"] = str(inicio + len(pagina)) if pagina else marca
+        else:
+            inicio = int(params.get("start", ["0"])[0])
+            pagina = docs[inicio:inicio + rows]
+
+        if campos != ["*"]:
+            pagina = [{c: d[c] for c in campos if c in d} for d in pagina]
+        resposta["response"]["docs"] = pagina
+
+        if "json.facet" in params:
+            facetas = json.loads(params["json.facet"][0])
+            resposta["facets"] = {"count": len(docs)}
+            for nome, faceta in facetas.items():
+                resposta["facets"][nome] = self._faixas_json(docs, faceta)
+        return resposta
+
+    @staticmethod
+    def _faixas_json(docs: list, faceta: dict) -> dict:
+        # Apenas `type: range` com agregações `sum(campo)`, como na reconciliação
+        campo, passo, fim = faceta["field"], int(faceta["gap"]), int(faceta["end"])
+        somas = {nome: SOMA_RE.fullmatch(expr)[1] for nome, expr in faceta.get("facet", {}).items()}
+
+        def bucket(selecionados, **extra):
+            resultado = {**extra, "count": len(selecionados)}
+            if selecionados:
+                for nome, origem in somas.items():
+                    resultado[nome] = float(sum(d.get(origem, 0) for d in selecionados))
+            return resultado
+
+        resumo = {"buckets": [bucket([d for d in docs if inicio <= d[campo] < inicio + passo], val=inicio)
+                              for inicio in range(int(faceta["start"]), fim, passo)]}
+        if faceta.get("other") == "after":
+            resumo["after"] = bucket([d for d in docs if d[campo] >= fim])
+        return resumo
+
+    def update(self, comando):
+        with self.lock:
+            self.updates += 1
+            if isinstance(comando, list):
+                for doc in comando:
+                    self.documentos[doc["id"]] = doc
+            elif isinstance(comando, dict) and "delete" in comando:
+                ids = comando["delete"]
+                if not isinstance(ids, list):
+                    ids = [ids]
+                for id_ in ids:
+                    self.documentos.pop(id_["id"] if isinstance(id_, dict) else id_, None)
+        return {"responseHeader": {"status": 0}}
+
+
+def _handler(solr: FakeSolr, capacidade: int):
+    vagas = threading.BoundedSemaphore(capacidade) if capacidade else None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _atender(self, metodo):
+            self.server.requisicoes += 1
+            if vagas is None:
+                return metodo()
+            with vagas:
+                return metodo()
+
+        def _responder(self, corpo: dict, status: int = 200):
+            if solr.latencia:
+                time.sleep(solr.latencia)
+            dados = json.dumps(corpo).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            self._atender(self._get)
+
+        def do_POST(self):
+            self._atender(self._post)
+
+        def _get(self):
+            url = urlparse(self.path)
+            if url.path.endswith("/admin/ping"):
+                return self._responder({"status": "OK"})
+            if url.path.endswith("/select"):
+                return self._responder(solr.select(parse_qs(url.query)))
+            self._responder({"error": {"msg": "handler desconhecido"}}, 404)
+
+        def _post(self):
+            tamanho = int(self.headers.get("Content-Length", 0))
+            corpo = self.rfile.read(tamanho)
+            if urlparse(self.path).path.endswith("/update"):
+                return self._responder(solr.update(json.loads(corpo or b"null")))
+            self._responder({"error": {"msg": "handler desconhecido"}}, 404)
+
+    return Handler
+
+
+def iniciar(porta: int = 0, latencia: float = 0.0, solr: FakeSolr = None, capacidade: int = 0):
+    """Sobe o Solr falso em uma thread e retorna `(servidor, estado)`.
+
+    Passe o `solr` de outra instância para subir uma réplica do mesmo core.
+    """
+    solr = solr or FakeSolr(latencia)
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), _handler(solr, capacidade))
+    servidor.daemon_threads = True
+    servidor.requisicoes = 0
+    threading.Thread(target=servidor.serve_forever, name="fake-solr", daemon=True).start()
+    return servidor, solr
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solr falso em memória.")
+    parser.add_argument("--port", type=int, default=8983)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--replicas", type=int, default=1, help="instâncias nas portas seguintes, com o mesmo estado")
+    parser.add_argument("--capacity", type=int, default=0, help="requisições simultâneas por instância (0 = sem limite)")
+    args = parser.parse_args()
+    solr = None
+    for i in range(args.replicas):
+        servidor, solr = iniciar(args.port + i, args.latency_ms / 1000, solr, args.capacity)
+        print(f"Solr falso em http://127.0.0.1:{servidor.server_port}/solr/cbo_core/select")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,245 @@
+"""Benchmark de carga e latência da API contra substitutos locais.
+
+Sobe o `app` Flask em um servidor WSGI com threads, usando SQLite (ou o
+Postgres indicado em `--database-url`) para tb_cbo e o Solr falso de
+`bench.fake_solr` com latência configurável. Executa uma carga mista em
+concorrência fixa e imprime um JSON com vazão e p50/p95/p99 por tipo de
+requisição, para comparar execuções ao longo do tempo.
+
+Uso:
+    python -m bench.run --concorrencia 8 --duracao 20 --solr-latencia-ms 5 \\
+        --mix busca=40,listagem=20,ponto=25,sugestao=10,escrita=5 --saida resultado.json
+
+Para medir o ganho de réplicas de leitura, limite a capacidade de cada Solr
+falso e varie a quantidade (a primeira instância faz o papel de líder):
+    python -m bench.run --mix busca=1 --solr-capacidade 2 --solr-replicas 3
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PADRAO = os.path.join(RAIZ, "data", "cbo2002-ocupacao.csv")
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def resumir(latencias: list, erros: int, duracao: float) -> dict:
+    latencias = sorted(latencias)
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "vazao_rps": round(len(latencias) / duracao, 2),
+        "media_ms": round(sum(latencias) / len(latencias) * 1000, 3) if latencias else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "max_ms": round(latencias[-1] * 1000, 3) if latencias else 0.0
+    }
+
+
+def ler_mix(texto: str) -> dict:
+    mix = {}
+    for parte in texto.split(","):
+        nome, peso = parte.split("=")
+        mix[nome.strip()] = float(peso)
+    return mix
+
+
+def preparar_ambiente(args, diretorio: str, solr_portas: list):
+    os.environ["SQLALCHEMY_DATABASE_URI"] = args.database_url or f"sqlite:///{diretorio}/bench.db?timeout=30"
+    os.environ["SOLR_QUERY_URL"] = f"http://127.0.0.1:{solr_portas[0]}/solr/cbo_core/select"
+    os.environ["SOLR_QUERY_URLS"] = ",".join(f"http://127.0.0.1:{porta}/solr/cbo_core/select" for porta in solr_portas)
+    os.environ["SOLR_UPDATE_URL"] = f"http://127.0.0.1:{solr_portas[0]}/solr/cbo_core/update"
+    os.environ["DATASET_VERSION_FILE"] = os.path.join(diretorio, "dataset.version")
+    os.environ["SNAPSHOT_DIR"] = os.path.join(diretorio, "snapshots")
+    for chave, valor in args.env:
+        os.environ[chave] = valor
+
+
+def carregar_dados(app, db, fake, arquivo: str) -> list:
+    """Cria tb_cbo a partir do CSV e replica os documentos no Solr falso."""
+    from helpers.bulk import upsert_cbos
+    from helpers.solr import documento
+
+    with open(arquivo, encoding="iso-8859-1", newline="") as f:
+        linhas = {int(r["CODIGO"]): r["TITULO"].strip() for r in csv.DictReader(f, delimiter=";")}
+
+    with app.app_context():
+        db.create_all()
+        itens = [{"cod_cbo": c, "titulo": t} for c, t in linhas.items()]
+        for inicio in range(0, len(itens), 1000):
+            upsert_cbos(itens[inicio:inicio + 1000])
+        db.session.commit()
+
+    fake.documentos = {str(c): documento(c, t) for c, t in linhas.items()}
+    return sorted(linhas.items())
+
+
+class Carga:
+    """Gera as requisições de cada tipo da carga mista."""
+
+    def __init__(self, base: str, cbos: list, semente: int):
+        self.base = base
+        self.cbos = cbos
+        self.paginas = max(1, len(cbos) // 100)
+        self.palavras = sorted({p for _, t in cbos for p in t.split() if len(p) >= 4 and p.isalpha()})
+        self.semente = semente
+
+    def executar(self, tipo: str, sessao: requests.Session, rnd: random.Random) -> bool:
+        if tipo == "busca":
+            r = sessao.get(f"{self.base}/cbos", params={"q": rnd.choice(self.palavras), "per_page": 20})
+        elif tipo == "listagem":
+            r = sessao.get(f"{self.base}/cbos", params={"page": rnd.randint(1, self.paginas), "per_page": 100})
+        elif tipo == "ponto":
+            r = sessao.get(f"{self.base}/cbo/{rnd.choice(self.cbos)[0]}")
+        elif tipo == "sugestao":
+            palavra = rnd.choice(self.palavras)
+            r = sessao.get(f"{self.base}/cbos/suggest", params={"prefix": palavra[:rnd.randint(1, 4)]})
+        elif tipo == "escrita":
+            cod_cbo, titulo = rnd.choice(self.cbos)
+            r = sessao.put(f"{self.base}/cbo/{cod_cbo}", json={"titulo": f"{titulo} [{rnd.random():.6f}]"})
+        else:
+            raise ValueError(f"Tipo de carga desconhecido: {tipo}")
+        return r.status_code < 400 or (tipo == "busca" and r.status_code == 404)
+
+
+def rodar(carga: Carga, mix: dict, concorrencia: int, aquecimento: float, duracao: float) -> dict:
+    tipos, pesos = zip(*mix.items())
+    latencias = defaultdict(list)
+    erros = defaultdict(int)
+    lock = threading.Lock()
+    inicio_medicao = time.monotonic() + aquecimento
+    fim = inicio_medicao + duracao
+
+    def trabalhador(numero: int):
+        rnd = random.Random(carga.semente + numero)
+        sessao = requests.Session()
+        while True:
+            agora = time.monotonic()
+            if agora >= fim:
+                return
+            tipo = rnd.choices(tipos, pesos)[0]
+            t0 = time.perf_counter()
+            try:
+                ok = carga.executar(tipo, sessao, rnd)
+            except requests.exceptions.RequestException:
+                ok = False
+            decorrido = time.perf_counter() - t0
+            if agora >= inicio_medicao:
+                with lock:
+                    latencias[tipo].append(decorrido)
+                    erros[tipo] += not ok
+
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    resultado = {tipo: resumir(latencias[tipo], erros[tipo], duracao) for tipo in tipos}
+    todas = [l for tipo in tipos for l in latencias[tipo]]
+    resultado["total"] = resumir(todas, sum(erros.values()), duracao)
+    return resultado
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API de CBOs.")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--duracao", type=float, default=20, help="segundos medidos")
+    parser.add_argument("--aquecimento", type=float, default=2, help="segundos descartados no início")
+    parser.add_argument("--mix", default="busca=40,listagem=20,ponto=25,sugestao=10,escrita=5")
+    parser.add_argument("--solr-latencia-ms", type=float, default=5)
+    parser.add_argument("--solr-replicas", type=int, default=1, help="instâncias do Solr falso para leitura")
+    parser.add_argument("--solr-capacidade", type=int, default=0,
+                        help="requisições simultâneas por instância do Solr falso (0 = sem limite)")
+    parser.add_argument("--database-url", help="usa este banco (ex.: Postgres) em vez de SQLite temporário")
+    parser.add_argument("--csv", default=CSV_PADRAO)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--env", nargs=2, action="append", default=[], metavar=("CHAVE", "VALOR"),
+                        help="variável de ambiente extra para a aplicação (ex.: --env SEARCH_BACKEND local)")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    from bench.fake_solr import iniciar as iniciar_solr
+
+    diretorio = tempfile.mkdtemp(prefix="cbo-bench-")
+    solr_servidores, fake = [], None
+    for _ in range(args.solr_replicas):
+        servidor_solr, fake = iniciar_solr(latencia=args.solr_latencia_ms / 1000, solr=fake,
+                                           capacidade=args.solr_capacidade)
+        solr_servidores.append(servidor_solr)
+    preparar_ambiente(args, diretorio, [s.server_port for s in solr_servidores])
+
+    # O app grava app.log no diretório corrente; o benchmark não deve sujar o repositório
+    sys.path.insert(0, RAIZ)
+    os.chdir(diretorio)
+    from werkzeug.serving import make_server
+    from app import app
+    from helpers.database import db
+
+    logging.getLogger("helpers.logging").setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    cbos = carregar_dados(app, db, fake, args.csv)
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name="bench-app", daemon=True).start()
+
+    carga = Carga(f"http://127.0.0.1:{servidor.server_port}", cbos, args.semente)
+    resultados = rodar(carga, ler_mix(args.mix), args.concorrencia, args.aquecimento, args.duracao)
+    servidor.shutdown()
+
+    relatorio = {
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "config": {
+            "concorrencia": args.concorrencia,
+            "duracao_s": args.duracao,
+            "mix": ler_mix(args.mix),
+            "solr_latencia_ms": args.solr_latencia_ms,
+            "solr_replicas": args.solr_replicas,
+            "solr_capacidade": args.solr_capacidade,
+            "banco": "externo" if args.database_url else "sqlite",
+            "env": dict(args.env),
+            "registros": len(cbos)
+        },
+        "solr": {"selects": fake.selects, "updates": fake.updates,
+                 "requisicoes_por_replica": [s.requisicoes for s in solr_servidores]},
+        "resultados": resultados
+    }
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(os.path.join(RAIZ, args.saida) if not os.path.isabs(args.saida) else args.saida, "w") as f:
+            f.write(saida + "\n")
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
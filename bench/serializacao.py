@@ -0,0 +1,64 @@
+"""Micro-benchmark da serialização de respostas: `marshal` + json vs serializador pré-compilado.
+
+Mede, para uma página de listagem (objetos ORM) e uma de busca (documentos
+do Solr), o tempo de transformar os itens e codificar o corpo da resposta.
+
+Uso:
+    python -m bench.serializacao [--itens 100] [--repeticoes 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de serialização.")
+    parser.add_argument("--itens", type=int, default=100)
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, RAIZ)
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+    from flask_restful import marshal
+    from helpers.serialization import codificar, orjson
+    from models.CBO import CBO, cbo_fields, serializar_cbo
+
+    titulos = [f"Técnico em manutenção de equipamentos {i}" for i in range(args.itens)]
+    linhas = [CBO(cod_cbo=100000 + i, titulo=t) for i, t in enumerate(titulos)]
+    docs = [{"cod_cbo": 100000 + i, "titulo": t} for i, t in enumerate(titulos)]
+
+    def envelope(cbos):
+        return {"CBOs": cbos, "per_page": args.itens, "total": 2694, "page": 1}
+
+    casos = {
+        "listagem (ORM)": {
+            "marshal + json": lambda: json.dumps(envelope(marshal(linhas, cbo_fields))).encode(),
+            "pré-compilado + codificar": lambda: codificar(envelope(serializar_cbo(linhas)))
+        },
+        "busca (docs Solr)": {
+            # O caminho antigo copiava cada documento antes do marshal
+            "marshal + json": lambda: json.dumps(envelope(marshal(
+                [{"cod_cbo": d["cod_cbo"], "titulo": d["titulo"]} for d in docs], cbo_fields
+            ))).encode(),
+            "pré-compilado + codificar": lambda: codificar(envelope(serializar_cbo(docs)))
+        }
+    }
+
+    print(f"{args.itens} itens por resposta, {args.repeticoes} repetições, "
+          f"codificador: {'orjson' if orjson is not None else 'json'}")
+    for nome, variantes in casos.items():
+        tempos = {}
+        for variante, funcao in variantes.items():
+            tempos[variante] = min(timeit.repeat(funcao, number=args.repeticoes, repeat=3)) / args.repeticoes
+        base = tempos["marshal + json"]
+        print(f"\n{nome}")
+        for variante, tempo in tempos.items():
+            print(f"  {variante:<28} {tempo * 1e6:9.1f} µs/resposta  ({base / tempo:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
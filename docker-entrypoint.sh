@@ -6,16 +6,18 @@ echo "==> Criando arquivo de log com permissões apropriadas..."
 touch /app/app.log
 chown www-data:www-data /app/app.log
 
-echo "==> Aplicando migrações do Flask..."
-flask db upgrade
-echo "==> Migrações aplicadas com sucesso!"
+echo "==> Preparando diretório de métricas do Prometheus (multiprocesso)..."
+rm -rf /tmp/prometheus_multiproc
+mkdir -p /tmp/prometheus_multiproc
+chown www-data:www-data /tmp/prometheus_multiproc
 
-echo "==> Iniciando a configuração do Solr (schema)..."
-python setup_solr.py # Configura o schema do Solr
-echo "==> Solr configurado com sucesso!"
+echo "==> Preparando contador de versão do dataset (compartilhado pelos workers)..."
+DATASET_VERSION_FILE="${DATASET_VERSION_FILE:-/tmp/cbo-dataset.version}"
+touch "$DATASET_VERSION_FILE"
+chown www-data:www-data "$DATASET_VERSION_FILE"
 
-echo "==> Inicializando e populando o Banco e Solr..."
-python init_db.py # Popula o DB e indexa o Solr
-echo "==> Banco e Solr inicializados com sucesso!"
+echo "==> Preparando banco e Solr (espera, migrações, schema e carga)..."
+python startup.py # Pula o que já estiver em dia (schema, carga do CSV e indexação)
+echo "==> Banco e Solr prontos!"
 
 exec "$@"
\ No newline at end of file
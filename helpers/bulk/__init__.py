@@ -0,0 +1,70 @@
+import os
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from helpers.database import db
+
+from models.CBO import CBO
+from models.SolrOutbox import SolrOutbox
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+
+
+def _insert(tabela):
+    """`INSERT` do dialeto em uso, que oferece `on_conflict_do_update`."""
+    if db.engine.dialect.name == "sqlite":
+        return sqlite.insert(tabela)
+    return postgresql.insert(tabela)
+
+
+def upsert_cbos(linhas: list):
+    """Insere ou atualiza várias CBOs em um único `INSERT ... ON CONFLICT`.
+
+    `linhas` é uma lista de dicts com `cod_cbo` e `titulo`, sem códigos
+    repetidos. Não faz commit nem registra a alteração na outbox.
+    """
+    if not linhas:
+        return
+    stmt = _insert(CBO)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CBO.cod_cbo],
+        set_={"titulo": stmt.excluded.titulo}
+    )
+    db.session.execute(stmt, linhas)
+
+
+def remover_cbos(codigos: list) -> set:
+    """Remove várias CBOs em um único `DELETE` e retorna os códigos removidos."""
+    if not codigos:
+        return set()
+    return set(db.session.execute(
+        db.delete(CBO).where(CBO.cod_cbo.in_(codigos)).returning(CBO.cod_cbo)
+    ).scalars())
+
+
+def registrar_alteracoes(alteracoes: list):
+    """Grava várias entradas na outbox do Solr de uma só vez.
+
+    `alteracoes` é uma lista de tuplas `(cod_cbo, operacao)`.
+    """
+    if alteracoes:
+        db.session.execute(
+            db.insert(SolrOutbox),
+            [{"cod_cbo": cod_cbo, "operacao": operacao} for cod_cbo, operacao in alteracoes]
+        )
+
+
+def sincronizar_sequencia():
+    """Avança a sequência de cod_cbo até o maior código existente (Postgres).
+
+    Necessário após inserções com código explícito, para que os próximos
+    POST /cbos não gerem códigos já usados.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return
+    db.session.execute(text(
+        "SELECT setval('public.tb_cbo_cod_cbo_seq', GREATEST("
+        "(SELECT COALESCE(MAX(cod_cbo), 1) FROM tb_cbo), "
+        "(SELECT last_value FROM public.tb_cbo_cod_cbo_seq)))"
+    ))
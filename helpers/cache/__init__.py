@@ -0,0 +1,267 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from helpers.logging import logger
+
+load_dotenv()
+
+DATASET_VERSION_FILE = os.getenv("DATASET_VERSION_FILE", "/tmp/cbo-dataset.version")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 60))
+LISTING_COUNT_TTL = float(os.getenv("LISTING_COUNT_TTL", 300))
+SUGGEST_CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", 4096))
+
+_CONTADOR = struct.Struct("<Q")
+# Tamanho fixo do arquivo de versões (até 8 contadores): com um único tamanho,
+# processos diferentes nunca encolhem o arquivo mapeado por outro
+_TAMANHO_ARQUIVO = 8 * _CONTADOR.size
+
+
+class DatasetVersion:
+    """Contador de versão do dataset compartilhado entre os workers.
+
+    O valor fica em um arquivo mapeado em memória: a leitura é um simples
+    acesso ao mmap, sem lock, e o incremento é serializado com `flock`.
+    Toda escrita em tb_cbo incrementa o contador, invalidando os caches
+    de todos os workers da mesma máquina. O mesmo arquivo guarda mais de um
+    contador, cada um na sua `posicao`.
+    """
+
+    def __init__(self, path: str = DATASET_VERSION_FILE, posicao: int = 0):
+        self.path = path
+        self._inicio = posicao * _CONTADOR.size
+        self._tamanho = _TAMANHO_ARQUIVO
+        self._mmap = None
+        self._fd = None
+        self._lock = threading.Lock()
+        # Sem permissão de escrita no arquivo, os incrementos ficam só neste processo
+        self._somente_leitura = False
+        self._local = 0
+
+    def _abrir(self):
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            return os.open(self.path, os.O_RDWR)
+        # Quem cria (ex.: o startup como root) libera a escrita para os workers,
+        # sem depender do umask
+        os.fchmod(fd, 0o666)
+        return fd
+
+    def _mapear(self):
+        with self._lock:
+            if self._mmap is None:
+                fd = None
+                try:
+                    fd = self._abrir()
+                    if os.fstat(fd).st_size < self._tamanho:
+                        os.ftruncate(fd, self._tamanho)
+                    self._mmap = mmap.mmap(fd, self._tamanho)
+                except OSError as e:
+                    # Ex.: arquivo criado por outro usuário sem permissão de escrita
+                    if fd is not None:
+                        os.close(fd)
+                    self._mapear_leitura(e)
+                    return self._mmap
+                self._fd = fd
+        return self._mmap
+
+    def _mapear_leitura(self, erro: OSError):
+        # Chamado com o lock: segue lendo a versão compartilhada (se houver) em vez
+        # de derrubar a requisição; as escritas deste processo só invalidam os
+        # caches dele, os demais workers dependem do TTL
+        self._somente_leitura = True
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+            if os.fstat(fd).st_size >= self._tamanho:
+                self._mmap = mmap.mmap(fd, self._tamanho, access=mmap.ACCESS_READ)
+                self._fd = fd
+            else:
+                os.close(fd)
+        except OSError:
+            pass
+        if self._mmap is None:
+            self._mmap = bytes(self._tamanho)
+        logger.warning(f"Versão do dataset em {self.path} sem escrita ({erro}): modo só leitura; "
+                       "escritas invalidam apenas os caches deste processo")
+
+    def atual(self) -> int:
+        return _CONTADOR.unpack_from(self._mapear(), self._inicio)[0] + self._local
+
+    def incrementar(self) -> int:
+        """Incrementa a versão e retorna o novo valor."""
+        area = self._mapear()
+        if self._somente_leitura:
+            with self._lock:
+                self._local += 1
+            return self.atual()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            versao = _CONTADOR.unpack_from(area, self._inicio)[0] + 1
+            _CONTADOR.pack_into(area, self._inicio, versao)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return versao
+
+    def avancar(self, versao: int):
+        """Leva o contador até `versao`, sem nunca voltar."""
+        area = self._mapear()
+        if self._somente_leitura:
+            with self._lock:
+                self._local = max(self._local, versao - _CONTADOR.unpack_from(area, self._inicio)[0])
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if _CONTADOR.unpack_from(area, self._inicio)[0] < versao:
+                _CONTADOR.pack_into(area, self._inicio, versao)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class SearchVersion:
+    """Versão dos resultados vindos do Solr.
+
+    O Solr só recebe uma escrita quando o indexador drena a outbox (e só a
+    mostra após o `commitWithin`), então enquanto a versão já visível nas
+    buscas (`indexada`) não alcança a do banco, `atual()` devolve None e
+    esses resultados não entram em cache nem ganham ETag.
+    """
+
+    def __init__(self, dataset: DatasetVersion, indexada: DatasetVersion):
+        self.dataset = dataset
+        self.indexada = indexada
+
+    def atual(self):
+        versao = self.dataset.atual()
+        return versao if self.indexada.atual() >= versao else None
+
+
+versao_dataset = DatasetVersion()
+
+# Última versão do dataset cujas escritas já aparecem nas buscas do Solr (avançada pelo indexador)
+versao_indexada = DatasetVersion(posicao=1)
+
+versao_busca = SearchVersion(versao_dataset, versao_indexada)
+
+
+class _Voo:
+    """Cálculo em andamento de uma chave (single-flight)."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+class ResultCache:
+    """Cache LRU com TTL e invalidação pela versão do dataset.
+
+    Misses concorrentes para a mesma chave são coalescidos: apenas a
+    primeira thread executa a função de cálculo e as demais aguardam o
+    resultado dela.
+    """
+
+    def __init__(self, tamanho: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL,
+                 versao: DatasetVersion = versao_dataset):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self.versao = versao
+        self._itens = OrderedDict()
+        self._voos = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def obter(self, chave, calcular, versao: DatasetVersion = None):
+        """Retorna o valor em cache para `chave` ou o calcula com `calcular()`.
+
+        `versao` substitui a do cache nesta chamada. Com versão None o valor não
+        é lido nem guardado no cache, mas misses simultâneos continuam coalescidos.
+        """
+        if self.tamanho <= 0:
+            return calcular()
+
+        versao = (versao or self.versao).atual()
+        # O voo é por versão: quem chega depois de uma escrita não recebe um cálculo anterior a ela
+        chave_voo = (chave, versao)
+        with self._lock:
+            item = self._itens.get(chave) if versao is not None else None
+            if item is not None:
+                versao_item, expira_em, valor = item
+                if versao_item == versao and expira_em > time.monotonic():
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return valor
+                del self._itens[chave]
+
+            self.misses += 1
+            voo = self._voos.get(chave_voo)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave_voo] = _Voo()
+            else:
+                self.coalesced += 1
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.valor
+
+        try:
+            voo.valor = calcular()
+        except BaseException as e:
+            voo.erro = e
+            raise
+        else:
+            if versao is not None:
+                with self._lock:
+                    self._itens[chave] = (versao, time.monotonic() + self.ttl, voo.valor)
+                    self._itens.move_to_end(chave)
+                    while len(self._itens) > self.tamanho:
+                        self._itens.popitem(last=False)
+                        self.evictions += 1
+            return voo.valor
+        finally:
+            with self._lock:
+                self._voos.pop(chave_voo, None)
+            voo.evento.set()
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "tamanho": len(self._itens),
+                "capacidade": self.tamanho,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "versao_dataset": self.versao.atual()
+            }
+
+
+cache_busca = ResultCache(versao=versao_busca)
+
+# Total de registros da listagem (geral e por grupo): recalculado apenas quando uma escrita muda a versão
+cache_total = ResultCache(tamanho=128, ttl=LISTING_COUNT_TTL)
+
+# Contagens por família da hierarquia CBO, base do endpoint de facetas
+cache_hierarquia = ResultCache(tamanho=1, ttl=LISTING_COUNT_TTL)
+
+# Sugestões por prefixo: prefixos curtos casam com muitos títulos e se repetem muito
+cache_sugestoes = ResultCache(tamanho=SUGGEST_CACHE_SIZE)
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio-aberto"
+
+
+class Ficha:
+    """Autorização de uma chamada, devolvida por `permitir()`.
+
+    Guarda a geração do disjuntor (cada mudança de estado inicia uma nova):
+    o resultado de uma chamada iniciada em outro estado não conta.
+    """
+    __slots__ = ("geracao", "sonda")
+
+    def __init__(self, geracao: int, sonda: bool):
+        self.geracao = geracao
+        self.sonda = sonda
+
+
+class CircuitBreaker:
+    """Disjuntor por processo para chamadas a um serviço externo.
+
+    - Fechado: as chamadas passam e o resultado das últimas `janela` entra na
+      conta. Com pelo menos `minimo_chamadas` na janela, abre se a fração de
+      falhas ou de chamadas lentas (acima de `limite_lenta` segundos) atingir
+      `taxa_erro` ou `taxa_lenta`.
+    - Aberto: recusa tudo por `tempo_aberto` segundos, sem esperar o serviço.
+    - Meio-aberto: deixa passar até `sondas` chamadas de teste; se alguma
+      falhar ou for lenta, volta a abrir, senão fecha com a janela zerada.
+
+    Quem chama deve pedir `permitir()` antes e, se receber uma ficha, sempre
+    chamar `registrar(ficha, ...)` depois (inclusive em caso de exceção).
+    Só as sondas decidem o meio-aberto: uma chamada iniciada com o disjuntor
+    fechado que termina depois da abertura é ignorada.
+    """
+
+    def __init__(self, janela: int = 20, minimo_chamadas: int = 10, taxa_erro: float = 0.5,
+                 taxa_lenta: float = 0.5, limite_lenta: float = 1.0, tempo_aberto: float = 10.0,
+                 sondas: int = 1):
+        self.minimo_chamadas = minimo_chamadas
+        self.taxa_erro = taxa_erro
+        self.taxa_lenta = taxa_lenta
+        self.limite_lenta = limite_lenta
+        self.tempo_aberto = tempo_aberto
+        self.sondas = sondas
+        self._janela = deque(maxlen=janela)  # (falhou, lenta)
+        self._estado = FECHADO
+        self._aberto_ate = 0.0
+        self._sondas_em_curso = 0
+        self._geracao = 0
+        self._lock = threading.Lock()
+        self.aberturas = 0
+        self.recusadas = 0
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._atualizar()
+
+    def _atualizar(self) -> str:
+        # Chamado com o lock: passado o tempo aberto, libera as sondas
+        if self._estado == ABERTO and time.monotonic() >= self._aberto_ate:
+            self._mudar(MEIO_ABERTO)
+            self._sondas_em_curso = 0
+        return self._estado
+
+    def _mudar(self, estado: str):
+        self._estado = estado
+        self._geracao += 1
+
+    def _abrir(self):
+        self._mudar(ABERTO)
+        self._aberto_ate = time.monotonic() + self.tempo_aberto
+        self._janela.clear()
+        self.aberturas += 1
+
+    def permitir(self) -> Ficha:
+        """Ficha para a chamada, ou None se o disjuntor a recusa."""
+        with self._lock:
+            estado = self._atualizar()
+            if estado == FECHADO:
+                return Ficha(self._geracao, sonda=False)
+            if estado == MEIO_ABERTO and self._sondas_em_curso < self.sondas:
+                self._sondas_em_curso += 1
+                return Ficha(self._geracao, sonda=True)
+            self.recusadas += 1
+            return None
+
+    def registrar(self, ficha: Ficha, falhou: bool, duracao: float = 0.0):
+        lenta = duracao > self.limite_lenta
+        with self._lock:
+            if ficha.geracao != self._geracao:
+                # Chamada iniciada em outro estado (ex.: fechado, antes da abertura); não muda mais nada
+                return
+            if ficha.sonda:
+                self._sondas_em_curso -= 1
+                if falhou or lenta:
+                    self._abrir()
+                elif self._sondas_em_curso <= 0:
+                    self._mudar(FECHADO)
+                return
+            self._janela.append((falhou, lenta))
+            total = len(self._janela)
+            if total < self.minimo_chamadas:
+                return
+            falhas = sum(1 for f, _ in self._janela if f)
+            lentas = sum(1 for _, l in self._janela if l)
+            if falhas / total >= self.taxa_erro or lentas / total >= self.taxa_lenta:
+                self._abrir()
+
+    def restante_aberto(self) -> float:
+        """Segundos até a próxima sonda (0 se não está aberto)."""
+        with self._lock:
+            if self._atualizar() != ABERTO:
+                return 0.0
+            return max(self._aberto_ate - time.monotonic(), 0.0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            estado = self._atualizar()
+            return {
+                "estado": estado,
+                "chamadas_janela": len(self._janela),
+                "falhas_janela": sum(1 for f, _ in self._janela if f),
+                "lentas_janela": sum(1 for _, l in self._janela if l),
+                "aberto_por": round(max(self._aberto_ate - time.monotonic(), 0.0), 3) if estado == ABERTO else 0.0,
+                "aberturas": self.aberturas,
+                "recusadas": self.recusadas
+            }
@@ -0,0 +1,63 @@
+from helpers.cache import cache_hierarquia
+from helpers.database import db
+
+from models.CBO import CBO
+
+# Códigos CBO têm 6 dígitos (com zeros à esquerda); cada nível é um prefixo do código
+DIGITOS = 6
+NIVEIS = (
+    ("grande_grupo", 1),
+    ("subgrupo_principal", 2),
+    ("subgrupo", 3),
+    ("familia", 4)
+)
+
+
+def codigo_formatado(cod_cbo: int) -> str:
+    """Código com zeros à esquerda (ex.: 10105 -> '010105')."""
+    return f"{cod_cbo:0{DIGITOS}d}"
+
+
+def faixa_grupo(grupo: str) -> tuple:
+    """Faixa `(inicio, fim)` de cod_cbo coberta por um prefixo da hierarquia.
+
+    Como os códigos são inteiros, o prefixo '41' corresponde a 410000..419999
+    e '01' a 10000..19999, o que permite filtrar com uma varredura de faixa
+    na chave primária (ou um `fq` de faixa no Solr).
+    """
+    if not grupo.isdigit() or not 1 <= len(grupo) <= DIGITOS:
+        raise ValueError(f"Grupo deve ter de 1 a {DIGITOS} dígitos.")
+    escala = 10 ** (DIGITOS - len(grupo))
+    inicio = int(grupo) * escala
+    return inicio, inicio + escala - 1
+
+
+def _contagens_familias() -> dict:
+    consulta = (
+        db.select(CBO.cod_cbo // 100, db.func.count())
+        .group_by(CBO.cod_cbo // 100)
+    )
+    return {codigo_formatado(familia * 100)[:4]: total
+            for familia, total in db.session.execute(consulta)}
+
+
+def contagens_familias() -> dict:
+    """Quantidade de ocupações por família, recalculada apenas após escritas."""
+    return cache_hierarquia.obter("familias", _contagens_familias)
+
+
+def facetas(grupo: str = None) -> dict:
+    """Contagens por nível da hierarquia, opcionalmente restritas a um grupo
+    (prefixo de até 4 dígitos, ou seja, no máximo uma família)."""
+    niveis = {nome: {} for nome, _ in NIVEIS}
+    for familia, total in contagens_familias().items():
+        if grupo and not familia.startswith(grupo):
+            continue
+        for nome, tamanho in NIVEIS:
+            codigo = familia[:tamanho]
+            niveis[nome][codigo] = niveis[nome].get(codigo, 0) + total
+
+    return {
+        nome: [{"codigo": codigo, "total": total} for codigo, total in sorted(contagens.items())]
+        for nome, contagens in niveis.items()
+    }
@@ -0,0 +1,183 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+from dotenv import load_dotenv
+
+from helpers.application import app
+from helpers.cache import versao_busca, versao_dataset
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele a compressão usa apenas gzip
+    brotli = None
+
+load_dotenv()
+
+HTTP_CACHE_CONTROL = os.getenv("HTTP_CACHE_CONTROL", "public, max-age=60")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6))
+COMPRESSED_CACHE_SIZE = int(os.getenv("COMPRESSED_CACHE_SIZE", 256))
+
+# Rotas de leitura cujo corpo depende apenas da URL e da versão do dataset
+ROTAS_CONDICIONAIS = {"/cbos", "/cbo/<int:cod_cbo>", "/cbos/suggest", "/cbos/facets"}
+# Rotas (e o parâmetro que as leva ao Solr) cujo corpo segue a versão das buscas
+ROTAS_BUSCA = {"/cbos": "q", "/cbos/suggest": "prefix"}
+
+
+def _codificacao_aceita() -> str:
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def _comprimir(dados: bytes, codificacao: str) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(dados, quality=min(COMPRESSION_LEVEL, 11))
+    # mtime=0 mantém a saída determinística para a mesma entrada
+    return gzip.compress(dados, compresslevel=COMPRESSION_LEVEL, mtime=0)
+
+
+def etag_atual(codificacao: str = None) -> str:
+    """ETag forte da requisição atual: versão do dataset + URL (+ codificação).
+
+    Toda escrita incrementa a versão do dataset, então a mesma URL na mesma
+    versão sempre produz o mesmo corpo. Buscas respondidas pelo Solr não têm
+    ETag (None) enquanto a última escrita ainda não chegou ao índice.
+    """
+    parametro = ROTAS_BUSCA.get(request.url_rule.rule) if request.url_rule is not None else None
+    if parametro and request.args.get(parametro, "").strip():
+        versao = versao_busca.atual()
+    else:
+        versao = versao_dataset.atual()
+    if versao is None:
+        return None
+    url = hashlib.blake2b(request.full_path.encode(), digest_size=8).hexdigest()
+    etag = f"{versao}-{url}"
+    return f"{etag}-{codificacao}" if codificacao else etag
+
+
+class CompressedCache:
+    """LRU de corpos já comprimidos, indexado pela ETag da representação.
+
+    Como a ETag inclui a versão do dataset, entradas antigas nunca são
+    servidas depois de uma escrita; elas apenas saem pelo LRU.
+    """
+
+    def __init__(self, tamanho: int = COMPRESSED_CACHE_SIZE):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, etag: str):
+        with self._lock:
+            item = self._itens.get(etag)
+            if item is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(etag)
+            self.hits += 1
+            return item
+
+    def guardar(self, etag: str, corpo: bytes, mimetype: str):
+        if self.tamanho <= 0:
+            return
+        with self._lock:
+            self._itens[etag] = (corpo, mimetype)
+            self._itens.move_to_end(etag)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "tamanho": len(self._itens),
+                "capacidade": self.tamanho,
+                "bytes": sum(len(corpo) for corpo, _ in self._itens.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+cache_comprimido = CompressedCache()
+
+
+def _cabecalhos_cache(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = HTTP_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@app.before_request
+def _responder_do_cache():
+    """Atende 304 e corpos comprimidos em cache antes de qualquer acesso ao banco."""
+    if request.method != "GET" or request.url_rule is None or request.url_rule.rule not in ROTAS_CONDICIONAIS:
+        return None
+    if g.get("perfil") is not None:
+        # Requisição perfilada (helpers.profiling, registrado antes): precisa executar de verdade
+        return None
+
+    codificacao = _codificacao_aceita()
+    etag = etag_atual(codificacao)
+    if etag is None:
+        return None
+    g.http_cache = (etag, codificacao)
+
+    if request.if_none_match.contains_weak(etag):
+        g.http_cache_pronto = True
+        return _cabecalhos_cache(Response(status=304), etag)
+
+    if codificacao:
+        item = cache_comprimido.obter(etag)
+        if item is not None:
+            corpo, mimetype = item
+            response = Response(corpo, mimetype=mimetype)
+            response.headers["Content-Encoding"] = codificacao
+            g.http_cache_pronto = True
+            return _cabecalhos_cache(response, etag)
+    return None
+
+
+@app.after_request
+def _comprimir_resposta(response: Response) -> Response:
+    if g.pop("http_cache_pronto", False):
+        return response
+
+    etag, codificacao = g.pop("http_cache", (None, None))
+    if g.pop("resposta_degradada", False) or g.get("perfil") is not None:
+        # Resposta de contingência (ex.: índice local no lugar do Solr) ou perfilada: não
+        # leva a ETag da resposta normal nem entra em cache algum, local ou intermediário
+        etag = None
+        response.headers["Cache-Control"] = "no-store"
+    if etag is not None and response.status_code == 200:
+        _cabecalhos_cache(response, etag)
+    elif etag is None:
+        codificacao = _codificacao_aceita() if request.method != "HEAD" else None
+
+    if (codificacao is None or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+
+    dados = response.get_data()
+    response.vary.add("Accept-Encoding")
+    if len(dados) < COMPRESSION_MIN_SIZE:
+        return response
+
+    comprimido = _comprimir(dados, codificacao)
+    response.set_data(comprimido)
+    response.headers["Content-Encoding"] = codificacao
+    if etag is not None and response.status_code == 200:
+        cache_comprimido.guardar(etag, comprimido, response.mimetype)
+    return response
@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import requests
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+
+from helpers.application import app
+from helpers.cache import versao_dataset, versao_indexada
+from helpers.database import db
+from helpers.logging import logger, log_exception
+from helpers.solr import solr, documento
+
+from models.CBO import CBO
+from models.SolrOutbox import SolrOutbox
+from models.SolrOutboxFalha import SolrOutboxFalha
+
+SOLR_INDEXER_EMBEDDED = os.getenv("SOLR_INDEXER_EMBEDDED", "true").lower() in ("1", "true", "yes")
+SOLR_INDEXER_BATCH_SIZE = int(os.getenv("SOLR_INDEXER_BATCH_SIZE", 500))
+SOLR_INDEXER_INTERVAL = float(os.getenv("SOLR_INDEXER_INTERVAL", 1))
+SOLR_INDEXER_MAX_BACKOFF = float(os.getenv("SOLR_INDEXER_MAX_BACKOFF", 60))
+SOLR_COMMIT_WITHIN = int(os.getenv("SOLR_COMMIT_WITHIN", 1000))
+# Recusas (4xx) do Solr para a mesma entrada antes de movê-la para tb_solr_outbox_falhas
+SOLR_INDEXER_MAX_ATTEMPTS = int(os.getenv("SOLR_INDEXER_MAX_ATTEMPTS", 5))
+
+# Primeira chave das travas consultivas (pg_advisory) por cod_cbo do indexador
+_TRAVA_CODIGOS = 0x43424F
+
+
+def registrar_alteracao(cod_cbo: int, operacao: str):
+    """Adiciona a alteração à outbox na transação corrente (sem commit)."""
+    db.session.add(SolrOutbox(cod_cbo=cod_cbo, operacao=operacao))
+
+
+def enviar_ao_solr(codigos) -> tuple:
+    """Sincroniza no Solr o estado atual de tb_cbo para os códigos informados.
+
+    Idempotente: o documento é montado a partir da linha atual da tabela
+    (e não da operação registrada), e códigos sem linha são removidos.
+    Retorna a quantidade de documentos enviados e removidos.
+    """
+    codigos = set(codigos)
+    linhas = db.session.execute(
+        db.select(CBO.cod_cbo, CBO.titulo).where(CBO.cod_cbo.in_(codigos))
+    ).all()
+    documentos = [documento(cod_cbo, titulo) for cod_cbo, titulo in linhas]
+    remover = [str(cod_cbo) for cod_cbo in codigos - {cod_cbo for cod_cbo, _ in linhas}]
+
+    params = {"commitWithin": SOLR_COMMIT_WITHIN}
+    if documentos:
+        solr.update(documentos, params=params)
+    if remover:
+        solr.update({"delete": remover}, params=params)
+    return len(documentos), len(remover)
+
+
+def _recusado(erro: requests.exceptions.RequestException) -> bool:
+    """Se o Solr rejeitou o conteúdo (4xx), e não apenas falhou em atender."""
+    status = erro.response.status_code if erro.response is not None else None
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def _enviar_isolando(pendentes: list) -> tuple:
+    """Envia as entradas ao Solr; se ele recusar o lote, divide ao meio até isolar as recusadas.
+
+    Retorna (aplicadas, recusadas com a mensagem de erro, documentos enviados,
+    remoções). Falhas que não são recusas (rede, 5xx) sobem como exceção.
+    """
+    try:
+        enviados, removidos = enviar_ao_solr(p.cod_cbo for p in pendentes)
+        return list(pendentes), [], enviados, removidos
+    except requests.exceptions.HTTPError as e:
+        if not _recusado(e):
+            raise
+        if len(pendentes) == 1:
+            return [], [(pendentes[0], f"{e.response.status_code}: {e.response.text[:500]}")], 0, 0
+
+    meio = len(pendentes) // 2
+    aplicadas, recusadas, enviados, removidos = _enviar_isolando(pendentes[:meio])
+    resto = _enviar_isolando(pendentes[meio:])
+    return aplicadas + resto[0], recusadas + resto[1], enviados + resto[2], removidos + resto[3]
+
+
+def _recusar(entrada: SolrOutbox, erro: str) -> bool:
+    """Conta a recusa; na última permitida move a entrada para tb_solr_outbox_falhas.
+
+    Só as recusas contam para o limite: falhas de rede e 5xx (que também
+    somam em `tentativas`) não aproximam a entrada do descarte.
+    """
+    entrada.tentativas += 1
+    entrada.recusas += 1
+    if entrada.recusas < SOLR_INDEXER_MAX_ATTEMPTS:
+        logger.warning(f"Indexador: CBO {entrada.cod_cbo} ({entrada.operacao}) recusada pelo Solr "
+                       f"(recusa {entrada.recusas}/{SOLR_INDEXER_MAX_ATTEMPTS}): {erro}")
+        return False
+    db.session.add(SolrOutboxFalha(cod_cbo=entrada.cod_cbo, operacao=entrada.operacao,
+                                   criado_em=entrada.criado_em, tentativas=entrada.tentativas, erro=erro))
+    db.session.delete(entrada)
+    logger.error(f"Indexador: CBO {entrada.cod_cbo} ({entrada.operacao}) recusada pelo Solr "
+                 f"{entrada.recusas} vezes; movida para tb_solr_outbox_falhas: {erro}")
+    return True
+
+
+def _travar_codigos(codigos: set) -> set:
+    """Trava até o fim da transação os códigos que nenhum outro indexador está enviando.
+
+    Com SKIP LOCKED, dois indexadores podem pegar entradas diferentes do mesmo
+    cod_cbo; se ambos enviassem ao mesmo tempo, o estado lido antes poderia
+    chegar ao Solr depois. Com a trava, quem vem depois só lê a linha de
+    tb_cbo após o commit do outro. Fora do Postgres não há o que travar.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return codigos
+    return set(db.session.execute(
+        text("SELECT c FROM unnest(:codigos) AS c WHERE pg_try_advisory_xact_lock(:chave, c)")
+        .bindparams(bindparam("codigos", type_=postgresql.ARRAY(db.Integer))),
+        {"codigos": sorted(codigos), "chave": _TRAVA_CODIGOS}
+    ).scalars())
+
+
+def drenar_lote(limite: int = SOLR_INDEXER_BATCH_SIZE) -> int:
+    """Processa um lote da outbox e retorna quantas entradas foram consumidas.
+
+    As linhas são travadas com SKIP LOCKED, permitindo que vários
+    indexadores (um por worker) rodem ao mesmo tempo sem disputa; códigos
+    que outro indexador está enviando ficam para o próximo ciclo. Se o
+    Solr falhar, as entradas permanecem na outbox para nova tentativa.
+    Entradas recusadas (4xx) são isoladas para não segurar as demais e, após
+    SOLR_INDEXER_MAX_ATTEMPTS recusas, saem da fila para tb_solr_outbox_falhas.
+    """
+    pendentes = db.session.execute(
+        db.select(SolrOutbox)
+        .order_by(SolrOutbox.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    livres = _travar_codigos({p.cod_cbo for p in pendentes}) if pendentes else set()
+    pendentes = [p for p in pendentes if p.cod_cbo in livres]
+    if not pendentes:
+        db.session.rollback()
+        return 0
+
+    ids = [p.id for p in pendentes]
+    try:
+        aplicadas, recusadas, enviados, removidos = _enviar_isolando(pendentes)
+    except requests.exceptions.RequestException:
+        db.session.rollback()
+        db.session.execute(
+            db.update(SolrOutbox)
+            .where(SolrOutbox.id.in_(ids))
+            .values(tentativas=SolrOutbox.tentativas + 1)
+        )
+        db.session.commit()
+        raise
+
+    if aplicadas:
+        db.session.execute(db.delete(SolrOutbox).where(SolrOutbox.id.in_([p.id for p in aplicadas])))
+    descartadas = sum(_recusar(entrada, erro) for entrada, erro in recusadas)
+    db.session.commit()
+    if aplicadas:
+        logger.info(f"Indexador: {len(aplicadas)} alterações aplicadas no Solr ({enviados} documentos, {removidos} remoções)")
+    # As recusadas ainda na fila não contam: voltam no próximo ciclo, não no mesmo laço
+    return len(aplicadas) + descartadas
+
+
+def confirmar_indexacao() -> bool:
+    """Avança `versao_indexada` quando a outbox está vazia; retorna se está em dia.
+
+    A versão é lida antes da contagem: como o incremento vem depois do commit
+    da escrita, tudo até ela já passou pela outbox. Com a outbox vazia, espera
+    o `commitWithin` para que o Solr já mostre essas escritas nas buscas.
+    """
+    versao = versao_dataset.atual()
+    if versao_indexada.atual() >= versao:
+        return True
+    pendentes = db.session.execute(db.select(db.func.count()).select_from(SolrOutbox)).scalar()
+    db.session.rollback()
+    if pendentes:
+        return False
+    time.sleep(SOLR_COMMIT_WITHIN / 1000)
+    versao_indexada.avancar(versao)
+    logger.info(f"Indexador: buscas do Solr em dia com a versão {versao} do dataset")
+    return True
+
+
+def estatisticas() -> dict:
+    """Profundidade da fila, atraso (em segundos) da alteração mais antiga e descartes."""
+    profundidade, mais_antiga = db.session.execute(
+        db.select(db.func.count(), db.func.min(SolrOutbox.criado_em))
+    ).one()
+    falhas = db.session.execute(db.select(db.func.count()).select_from(SolrOutboxFalha)).scalar()
+    atraso = (datetime.now() - mais_antiga).total_seconds() if mais_antiga else 0.0
+    return {"profundidade": profundidade, "atraso_segundos": round(max(atraso, 0.0), 3), "falhas": falhas}
+
+
+class Indexer:
+    """Laço em segundo plano que drena a outbox para o Solr."""
+
+    def __init__(self, intervalo: float = SOLR_INDEXER_INTERVAL,
+                 lote: int = SOLR_INDEXER_BATCH_SIZE,
+                 max_backoff: float = SOLR_INDEXER_MAX_BACKOFF):
+        self.intervalo = intervalo
+        self.lote = lote
+        self.max_backoff = max_backoff
+        self._evento = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        """Inicia a thread do indexador neste processo, se ainda não estiver rodando."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._evento = threading.Event()
+            self._thread = threading.Thread(target=self.executar, name="solr-indexer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def notificar(self):
+        """Acorda o indexador após uma escrita, sem esperar o próximo ciclo."""
+        if SOLR_INDEXER_EMBEDDED:
+            self.iniciar()
+            self._evento.set()
+
+    def executar(self):
+        espera = self.intervalo
+        while True:
+            self._evento.wait(espera)
+            self._evento.clear()
+            try:
+                with app.app_context():
+                    while drenar_lote(self.lote) == self.lote:
+                        pass
+                    # Só agora os caches e ETags das buscas no Solr voltam a valer
+                    confirmar_indexacao()
+                espera = self.intervalo
+            except (requests.exceptions.RequestException, SQLAlchemyError):
+                espera = min(espera * 2, self.max_backoff)
+                log_exception(f"Indexador: falha ao drenar a outbox, nova tentativa em {espera:.1f}s")
+            except Exception:
+                espera = min(espera * 2, self.max_backoff)
+                log_exception("Indexador: erro inesperado")
+
+
+indexador = Indexer()
+
+
+@app.cli.command("solr-indexer")
+def solr_indexer_command():
+    """Executa o indexador da outbox do Solr em primeiro plano."""
+    indexador.executar()
@@ -1,26 +1,157 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
 import traceback
+import uuid
 import logging
-from logging.handlers import RotatingFileHandler
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+
+from helpers.application import app
+
+# "json" (uma linha JSON por evento) ou "text" (formato legível, para desenvolvimento)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 50 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Fração das requisições cujas linhas INFO são registradas (WARNING e acima sempre são)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+
+# Atributos padrão do LogRecord; o que vier além disso (via `extra=`) vai para o JSON
+_ATRIBUTOS_PADRAO = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por evento, com o request_id e os campos passados em `extra=`."""
+
+    def format(self, record):
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "mensagem": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            evento["request_id"] = record.request_id
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                evento[chave] = valor
+        if record.exc_info:
+            evento["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class ContextoRequisicao(logging.Filter):
+    """Anexa o request_id e aplica a amostragem das linhas INFO por requisição."""
+
+    def filter(self, record):
+        if not has_request_context():
+            record.request_id = None
+            return True
+        record.request_id = g.get("request_id")
+        return record.levelno > logging.INFO or g.get("log_amostrado", True)
+
+
+class FilaHandler(QueueHandler):
+    """QueueHandler que não bloqueia e não formata na thread da requisição.
+
+    A thread que escreve (QueueListener) é iniciada sob demanda em cada
+    processo: após o fork do uWSGI os workers não herdam a thread do master.
+    Com a fila cheia a linha é descartada (e contada) em vez de esperar o disco.
+    """
+
+    def __init__(self, fila, handlers):
+        super().__init__(fila)
+        self.handlers = handlers
+        self.descartados = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _garantir_listener(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+                self._listener.start()
+                self._pid = pid
+
+    def prepare(self, record):
+        # A fila é local ao processo, então basta resolver a mensagem; a formatação fica no listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._garantir_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def parar(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+
+
+formatter = (JsonFormatter() if LOG_FORMAT == "json"
+             else logging.Formatter('%(asctime)s - %(levelname)s - %(request_id)s - %(message)s'))
+
+# Define os handlers de saída: console e, opcionalmente, arquivo rotativo
+handlers = [logging.StreamHandler()]
+if LOG_FILE:
+    handlers.append(RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT))
+for handler in handlers:
+    handler.setFormatter(formatter)
 
 # Create a logger with a unique name
 logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+logger.addFilter(ContextoRequisicao())
+
+fila_handler = FilaHandler(queue.Queue(LOG_QUEUE_SIZE), handlers)
+logger.addHandler(fila_handler)
+atexit.register(fila_handler.parar)
+
 
-# Configure logger to log messages of INFO, ERROR level and above
-logger.setLevel(logging.INFO)
+@app.before_request
+def _iniciar_requisicao():
+    # Reaproveita o X-Request-ID do proxy/cliente para correlacionar os logs
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    g.log_amostrado = LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
+    g.log_inicio = time.perf_counter()
 
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-# Define a handler to specify where the log messages should be sent
-streamHandler = logging.StreamHandler()  # Log messages to console
-streamHandler.setFormatter(formatter)
-logger.addHandler(streamHandler)
+@app.after_request
+def _registrar_acesso(response):
+    inicio = g.pop("log_inicio", None)
+    if inicio is not None:
+        response.headers["X-Request-ID"] = g.request_id
+        logger.info("Requisição atendida", extra={
+            "metodo": request.method,
+            "caminho": request.path,
+            "status": response.status_code,
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3)
+        })
+    return response
 
-# Define a RotatingFileHandler to log messages to a rotating set of files
-fileHandler = RotatingFileHandler('app.log', maxBytes=10000, backupCount=3)
-fileHandler.setFormatter(formatter)
-logger.addHandler(fileHandler)
 
-# Função que aplica tabulação para as informações da exceção
+# Função que registra a exceção corrente: em JSON, o traceback vai no campo "excecao";
+# em texto, aplica tabulação para as informações da exceção
 def log_exception(mensagem: str):
+    if LOG_FORMAT == "json":
+        logger.error(mensagem, exc_info=True)
+        return
     formatted_tb = traceback.format_exc().replace('\n', '\n\t')
-    logger.error(f"{mensagem}:\n\t{formatted_tb}")
\ No newline at end of file
+    logger.error(f"{mensagem}:\n\t{formatted_tb}")
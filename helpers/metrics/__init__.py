@@ -0,0 +1,119 @@
+import os
+import time
+
+from flask import g, request
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST,
+                               REGISTRY, generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from helpers.application import app
+
+# Com PROMETHEUS_MULTIPROC_DIR definido (ver uwsgi.ini), cada worker grava suas
+# métricas em arquivos nesse diretório e o /metrics agrega todos os processos.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+BACKEND_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+http_requests = Counter(
+    "cbo_http_requests_total", "Requisições HTTP atendidas.", ["rota", "metodo", "status"]
+)
+http_errors = Counter(
+    "cbo_http_errors_total", "Respostas HTTP com status de erro (>= 400).", ["rota", "metodo", "status"]
+)
+http_latency = Histogram(
+    "cbo_http_request_duration_seconds", "Latência das requisições HTTP.", ["rota", "metodo"]
+)
+solr_latency = Histogram(
+    "cbo_solr_request_duration_seconds", "Latência das chamadas ao Solr.", ["metodo", "handler"],
+    buckets=BACKEND_BUCKETS
+)
+solr_errors = Counter(
+    "cbo_solr_errors_total", "Chamadas ao Solr com erro de conexão ou status >= 400.", ["metodo", "handler"]
+)
+solr_circuit_state = Gauge(
+    "cbo_solr_circuit_state", "Estado do disjuntor do Solr por worker (0 = fechado, 1 = meio-aberto, 2 = aberto).",
+    multiprocess_mode="liveall"
+)
+solr_circuit_rejections = Counter(
+    "cbo_solr_circuit_rejections_total", "Chamadas ao Solr recusadas pelo disjuntor aberto."
+)
+solr_replica_up = Gauge(
+    "cbo_solr_replica_up", "Réplica de leitura do Solr em uso por worker (1) ou ejetada (0).", ["replica"],
+    multiprocess_mode="liveall"
+)
+db_latency = Histogram(
+    "cbo_db_query_duration_seconds", "Latência das instruções SQL.", ["operacao"],
+    buckets=BACKEND_BUCKETS
+)
+
+
+def _rota() -> str:
+    # Usa o template da rota (ex.: /cbo/<int:cod_cbo>) para não explodir a cardinalidade
+    return request.url_rule.rule if request.url_rule is not None else "desconhecida"
+
+
+@app.before_request
+def _iniciar_cronometro():
+    g.metrics_inicio = time.perf_counter()
+
+
+@app.after_request
+def _registrar_requisicao(response):
+    inicio = g.pop("metrics_inicio", None)
+    if inicio is not None:
+        rota, metodo, status = _rota(), request.method, str(response.status_code)
+        http_latency.labels(rota, metodo).observe(time.perf_counter() - inicio)
+        http_requests.labels(rota, metodo, status).inc()
+        if response.status_code >= 400:
+            http_errors.labels(rota, metodo, status).inc()
+    return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_inicio", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info["metrics_inicio"].pop()
+    operacao = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OUTRA"
+    db_latency.labels(operacao).observe(time.perf_counter() - inicio)
+
+
+@event.listens_for(Engine, "handle_error")
+def _erro_sql(contexto):
+    # after_cursor_execute não é chamado em caso de erro; descarta o início pendente
+    if contexto.connection is not None and contexto.connection.info.get("metrics_inicio"):
+        contexto.connection.info["metrics_inicio"].pop()
+
+
+def observar_solr(metodo: str, url: str, duracao: float, erro: bool):
+    """Registra uma chamada ao Solr (usado por helpers.solr)."""
+    handler = str(url).rsplit("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    solr_latency.labels(metodo, handler).observe(duracao)
+    if erro:
+        solr_errors.labels(metodo, handler).inc()
+
+
+def observar_disjuntor(estado: str, recusada: bool = False):
+    """Atualiza o estado do disjuntor do Solr e conta as chamadas recusadas (usado por helpers.solr)."""
+    solr_circuit_state.set({"fechado": 0, "meio-aberto": 1, "aberto": 2}[estado])
+    if recusada:
+        solr_circuit_rejections.inc()
+
+
+def observar_replica(url: str, saudavel: bool):
+    """Registra a ejeção/readmissão de uma réplica do Solr (usado por helpers.solr)."""
+    solr_replica_up.labels(url).set(1 if saudavel else 0)
+
+
+def gerar_metricas() -> tuple:
+    """Conteúdo do /metrics, agregando todos os workers no modo multiprocesso."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
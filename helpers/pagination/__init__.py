@@ -0,0 +1,29 @@
+import base64
+import binascii
+import json
+
+
+class CursorInvalido(ValueError):
+    """Token de paginação malformado ou de outra consulta."""
+
+
+def codificar_cursor(chave: str, **posicao) -> str:
+    """Gera o token opaco de paginação profunda devolvido ao cliente."""
+    dados = json.dumps({"q": chave, **posicao}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(token: str, chave: str) -> dict:
+    """Valida o token recebido; `*` inicia uma nova paginação.
+
+    Tokens da listagem (`after=`) usam o grupo filtrado como chave (vazia sem filtro).
+    """
+    if token == "*":
+        return {}
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        raise CursorInvalido("Cursor inválido.")
+    if not isinstance(dados, dict) or dados.get("q") != chave:
+        raise CursorInvalido("Cursor inválido para esta busca.")
+    return dados
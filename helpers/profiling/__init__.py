@@ -0,0 +1,177 @@
+import cProfile
+import glob
+import hmac
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from helpers.application import app
+from helpers.logging import logger, log_exception
+
+load_dotenv()
+
+# Com o modo desligado nenhum hook é registrado; ligado, só as requisições que
+# trazem o token no cabeçalho X-Profile são perfiladas (nunca na URL, que vai
+# parar em logs e caches)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+# Quantidade de perfis mantidos em disco (os mais antigos são apagados)
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", 200))
+# Funções listadas no resumo, pelo tempo acumulado
+PROFILING_TOP = int(os.getenv("PROFILING_TOP", 30))
+
+CABECALHO = "X-Profile"
+
+# cProfile mede só a thread em que foi ligado; um perfil por vez por processo
+# evita disputar o profiler global das versões mais novas do Python
+_ocupado = threading.Lock()
+# Lista de instruções SQL da requisição perfilada nesta thread (None fora dela)
+_local = threading.local()
+
+
+def token_valido(token: str) -> bool:
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def token_da_requisicao() -> str:
+    return request.headers.get(CABECALHO)
+
+
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, "sql", None) is not None:
+        context._perfil_inicio = time.perf_counter()
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_perfil_inicio", None)
+    if inicio is not None and getattr(_local, "sql", None) is not None:
+        _local.sql.append({
+            "sql": " ".join(statement.split()),
+            "execucoes": len(parameters) if executemany else 1,
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3)
+        })
+
+
+def _iniciar_perfil():
+    if not token_valido(token_da_requisicao()):
+        return
+    if not _ocupado.acquire(blocking=False):
+        logger.warning("Perfil ignorado: outro perfil já está em andamento neste worker")
+        return
+    _local.sql = []
+    g.perfil = cProfile.Profile()
+    g.perfil_inicio = time.perf_counter()
+    g.perfil.enable()
+
+
+def _encerrar_perfil(response):
+    perfil = g.pop("perfil", None)
+    if perfil is None:
+        return response
+    perfil.disable()
+    duracao = time.perf_counter() - g.pop("perfil_inicio")
+    sql, _local.sql = _local.sql, None
+    _ocupado.release()
+    try:
+        response.headers["X-Profile-Id"] = salvar(perfil, sql, duracao, response.status_code)
+    except OSError:
+        log_exception("Erro ao gravar o perfil da requisição")
+    return response
+
+
+def _descartar_perfil(exc):
+    # Garante a liberação se a resposta não chegou ao after_request
+    perfil = g.pop("perfil", None)
+    if perfil is not None:
+        perfil.disable()
+        _local.sql = None
+        _ocupado.release()
+
+
+def salvar(perfil: cProfile.Profile, sql: list, duracao: float, status: int) -> str:
+    """Grava o dump do pstats (`<id>.prof`) e o resumo (`<id>.json`); retorna o id."""
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    perfil_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    base = os.path.join(PROFILING_DIR, perfil_id)
+    perfil.dump_stats(f"{base}.prof")
+
+    estatisticas = pstats.Stats(perfil).stats
+    funcoes = sorted(estatisticas.items(), key=lambda item: item[1][3], reverse=True)[:PROFILING_TOP]
+    resumo = {
+        "id": perfil_id,
+        "request_id": g.get("request_id"),
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "metodo": request.method,
+        "caminho": request.path,
+        "parametros": dict(request.args.items(multi=True)),
+        "status": status,
+        "duracao_ms": round(duracao * 1000, 3),
+        "sql_total_ms": round(sum(s["duracao_ms"] for s in sql), 3),
+        "sql": sql,
+        "funcoes": [{
+            "funcao": f"{nome} ({arquivo}:{linha})",
+            "chamadas": chamadas,
+            "tempo_proprio_ms": round(proprio * 1000, 3),
+            "tempo_acumulado_ms": round(acumulado * 1000, 3)
+        } for (arquivo, linha, nome), (_, chamadas, proprio, acumulado, _) in funcoes]
+    }
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False)
+    _podar()
+    logger.info(f"Perfil {perfil_id} gravado para {request.method} {request.path}")
+    return perfil_id
+
+
+def _podar():
+    resumos = sorted(glob.glob(os.path.join(PROFILING_DIR, "*.json")), key=os.path.getmtime, reverse=True)
+    for antigo in resumos[PROFILING_KEEP:]:
+        for caminho in (antigo, f"{antigo[:-len('.json')]}.prof"):
+            try:
+                os.unlink(caminho)
+            except FileNotFoundError:
+                pass
+
+
+def listar(limite: int) -> list:
+    """Resumos dos perfis mais recentes (sem a lista de funções e de SQL)."""
+    resumos = sorted(glob.glob(os.path.join(PROFILING_DIR, "*.json")), key=os.path.getmtime, reverse=True)
+    perfis = []
+    for caminho in resumos[:limite]:
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                resumo = json.load(f)
+        except (OSError, ValueError):
+            continue
+        resumo["consultas_sql"] = len(resumo.pop("sql"))
+        resumo["funcao_mais_cara"] = resumo["funcoes"][0]["funcao"] if resumo["funcoes"] else None
+        del resumo["funcoes"]
+        perfis.append(resumo)
+    return perfis
+
+
+def caminho_perfil(perfil_id: str, extensao: str) -> str:
+    """Caminho do arquivo de um perfil, ou None se o id for inválido ou não existir."""
+    if os.path.basename(perfil_id) != perfil_id or perfil_id.startswith("."):
+        return None
+    caminho = os.path.join(PROFILING_DIR, f"{perfil_id}.{extensao}")
+    return caminho if os.path.exists(caminho) else None
+
+
+if PROFILING_ENABLED:
+    if not PROFILING_TOKEN:
+        logger.warning("PROFILING_ENABLED sem PROFILING_TOKEN: nenhuma requisição será perfilada")
+    else:
+        app.before_request(_iniciar_perfil)
+        app.after_request(_encerrar_perfil)
+        app.teardown_request(_descartar_perfil)
+        event.listen(Engine, "before_cursor_execute", _antes_sql)
+        event.listen(Engine, "after_cursor_execute", _depois_sql)
@@ -0,0 +1,147 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from helpers.application import app
+from helpers.database import db
+from helpers.indexer import SOLR_COMMIT_WITHIN
+from helpers.solr import solr, documento, hash_documento
+
+from models.CBO import CBO
+
+
+class Faixa:
+    """Resumo de uma faixa de cod_cbo: quantidade e soma dos hashes dos documentos.
+
+    A soma não depende da ordem e o Solr a calcula sozinho (JSON Facet sobre
+    `hash_doc`), então banco e Solr são comparados sem trazer documento algum.
+    """
+
+    def __init__(self, quantidade: int = 0, soma: int = 0):
+        self.quantidade = quantidade
+        self.soma = soma
+
+    def adicionar(self, hash_doc: int):
+        self.quantidade += 1
+        self.soma += hash_doc
+
+    def __eq__(self, outra):
+        return (self.quantidade, self.soma) == (outra.quantidade, outra.soma)
+
+
+def faixas_banco(tamanho: int) -> dict:
+    """Resumo por faixa de tb_cbo, em uma única varredura com cursor no servidor."""
+    faixas = {}
+    resultado = db.session.execute(
+        db.select(CBO.cod_cbo, CBO.titulo).execution_options(yield_per=5000)
+    )
+    for cod_cbo, titulo in resultado:
+        faixas.setdefault(cod_cbo // tamanho, Faixa()).adicionar(hash_documento(cod_cbo, titulo))
+    return faixas
+
+
+def faixas_solr(tamanho: int, maximo: int) -> dict:
+    """Resumo por faixa no Solr: contagem e soma de `hash_doc` em uma única consulta.
+
+    Documentos além do maior código conhecido caem em uma faixa extra, para
+    que a varredura os encontre como órfãos. Documentos sem `hash_doc`
+    (indexados antes do campo existir) somam zero e fazem a faixa divergir.
+    """
+    fim = (maximo // tamanho + 1) * tamanho
+    dados = solr.select({
+        "q": "*:*",
+        "rows": 0,
+        "json.facet": json.dumps({"faixas": {
+            "type": "range",
+            "field": "cod_cbo",
+            "start": 0,
+            "end": fim,
+            "gap": tamanho,
+            "other": "after",
+            "facet": {"soma": "sum(hash_doc)"}
+        }})
+    })
+    resumo = dados.get("facets", {}).get("faixas", {})
+    faixas = {}
+    for bucket in resumo.get("buckets", []):
+        if bucket["count"]:
+            faixas[int(bucket["val"]) // tamanho] = Faixa(bucket["count"], round(bucket.get("soma", 0)))
+    depois = resumo.get("after", {})
+    if depois.get("count"):
+        faixas[fim // tamanho] = Faixa(depois["count"], round(depois.get("soma", 0)))
+    return faixas
+
+
+def documentos_solr(faixa: int, tamanho: int, ultima: bool) -> dict:
+    """Hashes dos documentos de uma faixa divergente, por id (sem os títulos)."""
+    inicio = faixa * tamanho
+    fim = "*" if ultima else inicio + tamanho - 1
+    dados = solr.select({
+        "q": "*:*",
+        "fq": f"cod_cbo:[{inicio} TO {fim}]",
+        "fl": "id,hash_doc",
+        "rows": tamanho if not ultima else 1_000_000,
+        "sort": "id asc"
+    })
+    return {doc["id"]: doc.get("hash_doc") for doc in dados.get("response", {}).get("docs", [])}
+
+
+def reconciliar_faixa(faixa: int, tamanho: int, ultima: bool, aplicar: bool) -> dict:
+    """Detalha uma faixa cujo resumo divergiu e envia ao Solr apenas as diferenças."""
+    hashes = documentos_solr(faixa, tamanho, ultima)
+
+    with app.app_context():
+        consulta = db.select(CBO.cod_cbo, CBO.titulo).where(CBO.cod_cbo >= faixa * tamanho)
+        if not ultima:
+            consulta = consulta.where(CBO.cod_cbo < (faixa + 1) * tamanho)
+        linhas = db.session.execute(consulta).all()
+
+    enviar = [documento(cod_cbo, titulo) for cod_cbo, titulo in linhas
+              if hashes.get(str(cod_cbo)) != hash_documento(cod_cbo, titulo)]
+    remover = sorted(set(hashes) - {str(cod_cbo) for cod_cbo, _ in linhas})
+
+    if aplicar:
+        params = {"commitWithin": SOLR_COMMIT_WITHIN}
+        if enviar:
+            solr.update(enviar, params=params)
+        if remover:
+            solr.update({"delete": remover}, params=params)
+    return {"enviados": len(enviar), "removidos": len(remover)}
+
+
+@app.cli.command("solr-reconcile")
+@click.option("--tamanho-faixa", default=1000, show_default=True, help="Quantidade de códigos por faixa.")
+@click.option("--workers", default=8, show_default=True, help="Faixas verificadas em paralelo.")
+@click.option("--dry-run", is_flag=True, help="Apenas relata as divergências, sem corrigir o Solr.")
+def solr_reconcile_command(tamanho_faixa, workers, dry_run):
+    """Compara tb_cbo com o Solr por faixas de cod_cbo e corrige só o que divergir."""
+    inicio = time.monotonic()
+    banco = faixas_banco(tamanho_faixa)
+    maximo = max(banco, default=0) * tamanho_faixa
+    solr_faixas = faixas_solr(tamanho_faixa, maximo)
+    candidatas = sorted(set(banco) | set(solr_faixas))
+    ultima = candidatas[-1] if candidatas else None
+    # Só as faixas com contagem ou soma diferentes têm os documentos consultados
+    divergentes = [faixa for faixa in candidatas
+                   if banco.get(faixa, Faixa()) != solr_faixas.get(faixa, Faixa())]
+    click.echo(f"{len(candidatas)} faixas de {tamanho_faixa} códigos comparadas; "
+               f"{len(divergentes)} divergentes a detalhar...")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        resultados = dict(zip(divergentes, executor.map(
+            lambda faixa: reconciliar_faixa(faixa, tamanho_faixa, faixa == ultima, not dry_run),
+            divergentes
+        )))
+
+    enviados = sum(r["enviados"] for r in resultados.values())
+    removidos = sum(r["removidos"] for r in resultados.values())
+    for faixa in divergentes:
+        r = resultados[faixa]
+        click.echo(f"  faixa {faixa * tamanho_faixa}-{(faixa + 1) * tamanho_faixa - 1}: "
+                   f"{r['enviados']} a reenviar, {r['removidos']} órfãos")
+
+    acao = "a corrigir" if dry_run else "corrigidos"
+    click.echo(f"{len(divergentes)} faixas divergentes; {enviados} documentos e "
+               f"{removidos} órfãos {acao} em {time.monotonic() - inicio:.2f}s.")
@@ -0,0 +1,236 @@
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from helpers.cache import versao_dataset
+from helpers.database import db
+from helpers.logging import logger
+
+from models.CBO import CBO
+
+# "solr": apenas Solr | "local": apenas índice em memória | "fallback": Solr e, se falhar, índice local
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "fallback").lower()
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", 300))
+# "local": estrutura de prefixos em memória | "solr": campo edge n-gram `titulo_prefixo`
+SUGGEST_BACKEND = os.getenv("SUGGEST_BACKEND", "local").lower()
+
+STOPWORDS = frozenset({
+    "a", "ao", "aos", "as", "com", "da", "das", "de", "do", "dos", "e",
+    "em", "na", "nas", "no", "nos", "o", "os", "ou", "para", "por", "sem"
+})
+
+# Plurais mais comuns do português, já sem acentos (ordem importa)
+PLURAIS = (
+    ("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"),
+    ("ois", "ol"), ("res", "r"), ("zes", "z"), ("ns", "m")
+)
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalizar(texto: str) -> str:
+    """Converte para minúsculas e remove acentos (ex.: 'Técnico' -> 'tecnico')."""
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Stemmer leve para o português: reduz plural e flexão de gênero.
+
+    Não pretende ser linguisticamente completo, apenas fazer com que
+    'técnicas', 'técnico' e 'técnicos' caiam no mesmo termo.
+    """
+    if len(token) <= 3:
+        return token
+    for sufixo, troca in PLURAIS:
+        if token.endswith(sufixo):
+            token = token[:-len(sufixo)] + troca
+            break
+    else:
+        if token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+    if len(token) > 3 and token[-1] in "aeo":
+        token = token[:-1]
+    return token
+
+
+def analisar(texto: str) -> list:
+    """Tokeniza, normaliza e aplica stemming em um texto."""
+    return [stem(t) for t in TOKEN_RE.findall(normalizar(texto)) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """Índice invertido em memória sobre `CBO.titulo`, com ranking BM25.
+
+    Construído a partir da tabela tb_cbo no primeiro uso do worker e
+    atualizado incrementalmente pelos endpoints de escrita. Se a versão do
+    dataset avançar por escritas de outro worker, o índice é reconstruído.
+
+    Também mantém um array ordenado de pares (palavra sem acento, cod_cbo),
+    usado pelas sugestões por prefixo com busca binária.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, ttl: float = SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._titulos = {}
+        self._termos = {}
+        self._postings = defaultdict(dict)
+        self._total_termos = 0
+        self._normalizados = {}
+        self._palavras = []
+        self.carregado_em = None
+        self.versao = None
+
+    @property
+    def carregado(self) -> bool:
+        return self.carregado_em is not None
+
+    def carregar(self):
+        """(Re)constrói o índice inteiro a partir do banco de dados."""
+        versao = versao_dataset.atual()
+        linhas = db.session.execute(db.select(CBO.cod_cbo, CBO.titulo)).all()
+        with self._lock:
+            self._titulos = {}
+            self._termos = {}
+            self._postings = defaultdict(dict)
+            self._total_termos = 0
+            self._normalizados = {}
+            self._palavras = []
+            for cod_cbo, titulo in linhas:
+                self._adicionar(cod_cbo, titulo, ordenar=False)
+            self._palavras.sort()
+            self.carregado_em = time.monotonic()
+            self.versao = versao
+        logger.info(f"Índice de busca local carregado com {len(linhas)} CBOs")
+
+    def garantir_carregado(self):
+        if (self.carregado and self.versao == versao_dataset.atual()
+                and time.monotonic() - self.carregado_em < self.ttl):
+            return
+        self.carregar()
+
+    def _adicionar(self, cod_cbo: int, titulo: str, ordenar: bool = True):
+        termos = analisar(titulo)
+        self._titulos[cod_cbo] = titulo
+        self._termos[cod_cbo] = termos
+        self._total_termos += len(termos)
+        for termo in termos:
+            postings = self._postings[termo]
+            postings[cod_cbo] = postings.get(cod_cbo, 0) + 1
+
+        normalizado = normalizar(titulo)
+        tokens = TOKEN_RE.findall(normalizado)
+        self._normalizados[cod_cbo] = (normalizado, tokens)
+        for palavra in set(tokens):
+            if ordenar:
+                bisect.insort(self._palavras, (palavra, cod_cbo))
+            else:
+                self._palavras.append((palavra, cod_cbo))
+
+    def _retirar(self, cod_cbo: int):
+        termos = self._termos.pop(cod_cbo, None)
+        if termos is None:
+            return
+        del self._titulos[cod_cbo]
+        self._total_termos -= len(termos)
+        for palavra in set(self._normalizados.pop(cod_cbo)[1]):
+            posicao = bisect.bisect_left(self._palavras, (palavra, cod_cbo))
+            if posicao < len(self._palavras) and self._palavras[posicao] == (palavra, cod_cbo):
+                del self._palavras[posicao]
+        for termo in set(termos):
+            postings = self._postings[termo]
+            postings.pop(cod_cbo, None)
+            if not postings:
+                del self._postings[termo]
+
+    def _acompanhar_versao(self, versao: int):
+        # Só acompanha a nova versão se nenhuma escrita de outro worker ocorreu no meio
+        if self.versao == versao - 1:
+            self.versao = versao
+
+    def atualizar(self, cod_cbo: int, titulo: str, versao: int):
+        """Insere ou substitui uma CBO no índice (se já estiver carregado).
+
+        `versao` é a versão do dataset gerada pela escrita correspondente.
+        """
+        if not self.carregado:
+            return
+        with self._lock:
+            self._retirar(cod_cbo)
+            self._adicionar(cod_cbo, titulo)
+            self._acompanhar_versao(versao)
+
+    def remover(self, cod_cbo: int, versao: int):
+        if not self.carregado:
+            return
+        with self._lock:
+            self._retirar(cod_cbo)
+            self._acompanhar_versao(versao)
+
+    def buscar(self, consulta: str) -> list:
+        """Retorna todas as CBOs que casam com a consulta, ordenadas por relevância."""
+        self.garantir_carregado()
+        termos = analisar(consulta)
+        with self._lock:
+            n_docs = len(self._titulos)
+            if not termos or not n_docs:
+                return []
+            media = self._total_termos / n_docs
+            scores = defaultdict(float)
+            for termo in set(termos):
+                postings = self._postings.get(termo)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for cod_cbo, tf in postings.items():
+                    norma = self.K1 * (1 - self.B + self.B * len(self._termos[cod_cbo]) / media)
+                    scores[cod_cbo] += idf * tf * (self.K1 + 1) / (tf + norma)
+            ranking = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return [{"cod_cbo": cod, "titulo": self._titulos[cod]} for cod, _ in ranking]
+
+    def sugerir(self, prefixo: str, k: int) -> list:
+        """Sugestões de títulos para o texto digitado até agora.
+
+        A última palavra é tratada como prefixo e as anteriores precisam
+        aparecer no título (também como prefixo de alguma palavra). Títulos
+        que começam pelo texto digitado vêm primeiro, depois os que casam
+        mais cedo no título e os mais curtos.
+        """
+        self.garantir_carregado()
+        normalizado = " ".join(TOKEN_RE.findall(normalizar(prefixo)))
+        palavras = normalizado.split()
+        if not palavras:
+            return []
+        ultima, anteriores = palavras[-1], [p for p in palavras[:-1] if p not in STOPWORDS]
+
+        with self._lock:
+            inicio = bisect.bisect_left(self._palavras, (ultima,))
+            fim = bisect.bisect_left(self._palavras, (ultima + "\uffff",))
+            candidatos = {cod_cbo for _, cod_cbo in self._palavras[inicio:fim]}
+
+            ranking = []
+            for cod_cbo in candidatos:
+                titulo, tokens = self._normalizados[cod_cbo]
+                if anteriores and not all(any(t.startswith(p) for t in tokens) for p in anteriores):
+                    continue
+                if titulo.startswith(normalizado):
+                    ranking.append((0, 0, len(titulo), titulo, cod_cbo))
+                else:
+                    posicao = next(i for i, t in enumerate(tokens) if t.startswith(ultima))
+                    ranking.append((1, posicao, len(titulo), titulo, cod_cbo))
+
+            melhores = heapq.nsmallest(k, ranking)
+            return [{"cod_cbo": item[-1], "titulo": self._titulos[item[-1]]} for item in melhores]
+
+
+indice = SearchIndex()
@@ -0,0 +1,58 @@
+import json
+from operator import attrgetter
+
+from flask import make_response
+
+from helpers.application import api
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele a saída usa o json da biblioteca padrão
+    orjson = None
+
+
+def compilar(campos: dict):
+    """Gera um serializador equivalente a `marshal(dados, campos)` para modelos planos.
+
+    Os getters são montados uma única vez a partir dos nomes dos campos, e
+    cada item vira um `dict` simples em vez de um OrderedDict campo a campo.
+    Aceita objetos ORM (atributos) ou dicts (ex.: documentos do Solr), um
+    item ou uma lista, como o `marshal`. Os valores são usados como vêm do
+    banco/Solr, sem as conversões de `fields.*`.
+    """
+    nomes = tuple(campos)
+    por_atributo = attrgetter(*nomes)
+    if len(nomes) == 1:
+        por_atributo_1 = por_atributo
+        por_atributo = lambda obj: (por_atributo_1(obj),)
+
+    def por_chave(obj):
+        # Como o `marshal`: campo ausente no documento vira None, não KeyError
+        return tuple(obj.get(nome) for nome in nomes)
+
+    def serializar(dados):
+        if isinstance(dados, (list, tuple)):
+            if not dados:
+                return []
+            getter = por_chave if isinstance(dados[0], dict) else por_atributo
+            return [dict(zip(nomes, getter(item))) for item in dados]
+        getter = por_chave if isinstance(dados, dict) else por_atributo
+        return dict(zip(nomes, getter(dados)))
+
+    return serializar
+
+
+def codificar(dados) -> bytes:
+    """Codifica uma resposta em JSON (UTF-8), com orjson quando disponível."""
+    if orjson is not None:
+        return orjson.dumps(dados)
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+@api.representation("application/json")
+def saida_json(data, code, headers=None):
+    """Substitui o `output_json` do Flask-RESTful pelo codificador acima."""
+    resp = make_response(codificar(data) + b"\n", code)
+    resp.headers.extend(headers or {})
+    resp.mimetype = "application/json"
+    return resp
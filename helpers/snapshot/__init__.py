@@ -0,0 +1,180 @@
+import bisect
+import fcntl
+import glob
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from dotenv import load_dotenv
+
+from helpers.cache import versao_dataset, DATASET_VERSION_FILE
+from helpers.database import db
+from helpers.logging import logger
+
+from models.CBO import CBO
+
+load_dotenv()
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+# Por padrão fica ao lado do contador de versão, que define qual snapshot é o vigente
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", f"{DATASET_VERSION_FILE}.snapshots")
+
+# magic, versão do dataset, quantidade de CBOs, tamanho do bloco de títulos
+CABECALHO = struct.Struct("=8sQII")
+MAGICO = b"CBOSNAP1"
+
+
+class Snapshot:
+    """Cópia imutável de tb_cbo em um arquivo mapeado em memória.
+
+    Layout (ordem de bytes nativa; o arquivo não sai da máquina), depois do cabeçalho:
+      - códigos:  n × int64, em ordem crescente;
+      - offsets:  (n + 1) × uint32, início de cada título (na ordem dos códigos);
+      - ordem:    n × uint32, índices dos códigos na ordem (titulo, cod_cbo) do banco;
+      - posição:  n × uint32, inverso de `ordem` (posição de cada código na listagem);
+      - títulos:  UTF-8 concatenados.
+
+    As páginas do mmap são compartilhadas pelo kernel entre todos os workers.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, self.versao, n, tamanho = CABECALHO.unpack_from(self._mmap, 0)
+        if magico != MAGICO:
+            raise ValueError(f"Snapshot inválido: {path}")
+
+        visao = memoryview(self._mmap)
+        inicio = CABECALHO.size
+        partes = []
+        for formato, quantidade in (("q", n), ("I", n + 1), ("I", n), ("I", n)):
+            fim = inicio + quantidade * struct.calcsize(formato)
+            partes.append(visao[inicio:fim].cast(formato))
+            inicio = fim
+        self.codigos, self._offsets, self._ordem, self._posicao = partes
+        self._titulos = visao[inicio:inicio + tamanho]
+        self.total = n
+
+    def _item(self, i: int) -> dict:
+        titulo = str(self._titulos[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+        return {"cod_cbo": self.codigos[i], "titulo": titulo}
+
+    def _indice(self, cod_cbo: int) -> int:
+        i = bisect.bisect_left(self.codigos, cod_cbo)
+        return i if i < self.total and self.codigos[i] == cod_cbo else None
+
+    def buscar(self, cod_cbo: int) -> dict:
+        """CBO pelo código (busca binária), ou None."""
+        i = self._indice(cod_cbo)
+        return None if i is None else self._item(i)
+
+    def pagina(self, inicio: int, quantidade: int) -> list:
+        """Itens da listagem ordenada por (titulo, cod_cbo) a partir de `inicio`."""
+        return [self._item(self._ordem[j]) for j in range(inicio, min(inicio + quantidade, self.total))]
+
+    def apos(self, titulo: str, cod_cbo: int, quantidade: int) -> list:
+        """Página seguinte ao item (titulo, cod_cbo) de um cursor keyset.
+
+        A ordenação de títulos segue a collation do banco, que o Python não
+        reproduz; por isso o cursor é localizado pelo código. Se o item não
+        existe mais (ou mudou de título), retorna None e a consulta vai ao banco.
+        """
+        i = self._indice(cod_cbo)
+        if i is None or self._item(i)["titulo"] != titulo:
+            return None
+        return self.pagina(self._posicao[i] + 1, quantidade)
+
+
+def construir(path: str, versao: int):
+    """Lê tb_cbo (uma consulta, na ordem da listagem) e grava o snapshot em `path`."""
+    linhas = db.session.execute(
+        db.select(CBO.cod_cbo, CBO.titulo).order_by(CBO.titulo.asc(), CBO.cod_cbo.asc())
+    ).all()
+    por_codigo = sorted(range(len(linhas)), key=lambda r: linhas[r][0])
+
+    codigos = array("q", (linhas[r][0] for r in por_codigo))
+    offsets = array("I", [0])
+    titulos = bytearray()
+    posicao = array("I", bytes(4 * len(linhas)))
+    ordem = array("I", bytes(4 * len(linhas)))
+    for i, r in enumerate(por_codigo):
+        titulos += linhas[r][1].encode()
+        offsets.append(len(titulos))
+        posicao[i] = r
+        ordem[r] = i
+    temporario = f"{path}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(CABECALHO.pack(MAGICO, versao, len(linhas), len(titulos)))
+        for parte in (codigos, offsets, ordem, posicao):
+            f.write(parte.tobytes())
+        f.write(titulos)
+    # Publicação atômica: quem abrir o caminho vê o arquivo completo ou nenhum
+    os.replace(temporario, path)
+
+
+class SnapshotStore:
+    """Snapshot vigente deste worker, trocado quando a versão do dataset muda.
+
+    A leitura do snapshot atual não usa lock: basta comparar a versão no
+    mmap do contador com a do snapshot carregado. Só quem precisa trocar de
+    snapshot serializa; entre processos, a construção é feita uma única vez
+    por versão sob `flock` e os demais workers apenas mapeiam o arquivo.
+    """
+
+    def __init__(self, diretorio: str = SNAPSHOT_DIR, habilitado: bool = SNAPSHOT_ENABLED):
+        self.diretorio = diretorio
+        self.habilitado = habilitado
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def atual(self) -> Snapshot:
+        """Snapshot da versão atual do dataset, ou None se desabilitado."""
+        if not self.habilitado:
+            return None
+        versao = versao_dataset.atual()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.versao == versao:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.versao != versao:
+                self._snapshot = self._carregar(versao)
+            return self._snapshot
+
+    def _carregar(self, versao: int) -> Snapshot:
+        path = os.path.join(self.diretorio, f"tb_cbo-{versao}.snap")
+        while True:
+            if not os.path.exists(path):
+                self._construir(path, versao)
+            try:
+                return Snapshot(path)
+            except FileNotFoundError:
+                # Removido por um worker que publicou uma versão mais nova no meio do caminho
+                continue
+
+    def _construir(self, path: str, versao: int):
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(os.path.join(self.diretorio, ".lock"), "a") as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(path):
+                    construir(path, versao)
+                    logger.info(f"Snapshot de tb_cbo construído para a versão {versao}")
+                    self._remover_outros(path)
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _remover_outros(self, atual: str):
+        # Remove também versões "futuras": se o contador for recriado (volta a 0),
+        # um snapshot antigo de mesmo número nunca chega a ser reaproveitado.
+        # Workers que ainda mapeiam um arquivo removido continuam lendo após o unlink.
+        for outro in glob.glob(os.path.join(self.diretorio, "tb_cbo-*.snap")):
+            if outro != atual:
+                try:
+                    os.unlink(outro)
+                except FileNotFoundError:
+                    pass
+
+
+snapshot = SnapshotStore()
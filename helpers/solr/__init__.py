@@ -0,0 +1,427 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dotenv import load_dotenv
+
+from helpers.circuit_breaker import CircuitBreaker
+from helpers.metrics import observar_solr, observar_disjuntor, observar_replica
+from helpers.pagination import codificar_cursor
+from models.CBO import serializar_cbo
+
+load_dotenv()
+
+SOLR_QUERY_URL = os.getenv("SOLR_QUERY_URL")
+# Atualizações vão sempre ao líder (SOLR_UPDATE_URL); as consultas são distribuídas
+# entre as réplicas de SOLR_QUERY_URLS (separadas por vírgula), ou só SOLR_QUERY_URL
+SOLR_UPDATE_URL = os.getenv("SOLR_UPDATE_URL")
+SOLR_QUERY_URLS = [url.strip() for url in os.getenv("SOLR_QUERY_URLS", SOLR_QUERY_URL or "").split(",") if url.strip()]
+
+SOLR_POOL_SIZE = int(os.getenv("SOLR_POOL_SIZE", 10))
+SOLR_CONNECT_TIMEOUT = float(os.getenv("SOLR_CONNECT_TIMEOUT", 2))
+SOLR_READ_TIMEOUT = float(os.getenv("SOLR_READ_TIMEOUT", 10))
+SOLR_RETRIES = int(os.getenv("SOLR_RETRIES", 2))
+SOLR_RETRY_BACKOFF = float(os.getenv("SOLR_RETRY_BACKOFF", 0.2))
+
+# Prazo total (s) de uma busca/sugestão feita durante a requisição, incluindo as novas tentativas
+SOLR_SEARCH_DEADLINE = float(os.getenv("SOLR_SEARCH_DEADLINE", 2.5))
+
+# Réplicas: falhas seguidas até a ejeção e verificação periódica (/admin/ping) que ejeta e readmite
+SOLR_REPLICA_MAX_FAILURES = int(os.getenv("SOLR_REPLICA_MAX_FAILURES", 3))
+SOLR_HEALTH_INTERVAL = float(os.getenv("SOLR_HEALTH_INTERVAL", 5))
+SOLR_HEALTH_TIMEOUT = float(os.getenv("SOLR_HEALTH_TIMEOUT", 1))
+
+# Disjuntor: com Solr lento ou fora do ar, as chamadas falham na hora em vez de
+# ocupar os threads do uWSGI (SOLR_BREAKER_ENABLED=false desativa)
+SOLR_BREAKER_ENABLED = os.getenv("SOLR_BREAKER_ENABLED", "true").lower() == "true"
+SOLR_BREAKER_WINDOW = int(os.getenv("SOLR_BREAKER_WINDOW", 20))
+SOLR_BREAKER_MIN_CALLS = int(os.getenv("SOLR_BREAKER_MIN_CALLS", 10))
+SOLR_BREAKER_ERROR_RATE = float(os.getenv("SOLR_BREAKER_ERROR_RATE", 0.5))
+SOLR_BREAKER_SLOW_RATE = float(os.getenv("SOLR_BREAKER_SLOW_RATE", 0.5))
+SOLR_BREAKER_SLOW_CALL = float(os.getenv("SOLR_BREAKER_SLOW_CALL", 1.0))
+SOLR_BREAKER_OPEN_SECONDS = float(os.getenv("SOLR_BREAKER_OPEN_SECONDS", 10))
+SOLR_BREAKER_PROBES = int(os.getenv("SOLR_BREAKER_PROBES", 1))
+
+# Ordenação estável exigida pelo cursorMark do Solr (id = cod_cbo como string)
+SOLR_SORT = "score desc, id asc"
+
+# Relevância da busca (edismax): campos consultados, reforço de frase e mínimo de termos
+SOLR_SEARCH_QF = os.getenv("SOLR_SEARCH_QF", "titulo^3 titulo_ascii^2 titulo_prefixo^0.5")
+SOLR_SEARCH_PF = os.getenv("SOLR_SEARCH_PF", "titulo^6 titulo_ascii^4")
+SOLR_SEARCH_MM = os.getenv("SOLR_SEARCH_MM", "2<-1 5<75%")
+
+# Caracteres com significado na sintaxe do Lucene/edismax
+ESPECIAIS_RE = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+
+class SolrIndisponivel(requests.exceptions.RequestException):
+    """Chamada recusada pelo disjuntor aberto, sem chegar ao Solr."""
+
+    def __init__(self, mensagem: str, retry_after: float = None):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+def hash_documento(cod_cbo: int, titulo: str) -> int:
+    """Hash de 32 bits do conteúdo de uma CBO, gravado no documento como `hash_doc`.
+
+    A reconciliação compara somas desses hashes por faixa; o Solr soma em
+    double, e com 32 bits a soma segue exata mesmo para milhões de documentos.
+    """
+    return int.from_bytes(hashlib.blake2b(f"{cod_cbo}|{titulo}".encode(), digest_size=4).digest(), "big")
+
+
+def documento(cod_cbo: int, titulo: str) -> dict:
+    """Monta o documento Solr correspondente a uma CBO."""
+    return {
+        "id": str(cod_cbo),
+        "cod_cbo": cod_cbo,
+        "titulo": titulo,
+        "hash_doc": hash_documento(cod_cbo, titulo)
+    }
+
+
+def escapar(texto: str) -> str:
+    """Escapa a entrada do usuário para que seja tratada apenas como termos.
+
+    Operadores booleanos só valem em maiúsculas; como os analisadores já
+    ignoram a caixa, o texto vai em minúsculas e sem espaços repetidos, o que
+    também faz consultas equivalentes caírem na mesma entrada do queryResultCache.
+    """
+    return ESPECIAIS_RE.sub(r"\\\1", " ".join(texto.lower().split()))
+
+
+def filtro_faixa(campo: str, inicio: int, fim: int) -> str:
+    """Cláusula `fq` de faixa; fica separada da consulta para ser reaproveitada do filterCache."""
+    return f"{campo}:[{int(inicio)} TO {int(fim)}]"
+
+
+def consulta_edismax(texto: str, filtros: list = (), campos: str = "cod_cbo,titulo", linhas: int = 10) -> dict:
+    """Parâmetros de uma busca edismax sobre o título, com a entrada escapada."""
+    params = {
+        'defType': 'edismax',
+        'q': escapar(texto),
+        'qf': SOLR_SEARCH_QF,
+        'pf': SOLR_SEARCH_PF,
+        'mm': SOLR_SEARCH_MM,
+        'fl': campos,
+        'rows': linhas
+    }
+    if filtros:
+        params['fq'] = list(filtros)
+    return params
+
+
+def parametros_busca(consulta: str, page: int, per_page: int, posicao: dict, faixa: tuple) -> dict:
+    """Parâmetros do /select para a busca de `/cbos?q=`.
+
+    Com `posicao` (cursor) usa `cursorMark`; sem ela, paginação por `start`.
+    Cursores do índice local (`o`) não valem aqui.
+    """
+    if posicao and "m" not in posicao:
+        raise ValueError("Cursor sem cursorMark do Solr.")
+    filtros = [filtro_faixa("cod_cbo", *faixa)] if faixa else []
+    params = consulta_edismax(consulta, filtros, linhas=per_page)
+    params['sort'] = SOLR_SORT
+    if posicao is None:
+        params['start'] = (page - 1) * per_page
+    else:
+        # Paginação profunda: o Solr continua de onde o cursor parou, sem `start`
+        params['cursorMark'] = posicao.get("m", "*")
+    return params
+
+
+def resultado_busca(dados: dict, params: dict, chave: str, page: int, per_page: int, posicao: dict) -> dict:
+    """Converte a resposta do /select no envelope da API (direto dos documentos)."""
+    resposta = dados.get('response', {})
+    resultado = {
+        "CBOs": serializar_cbo(resposta.get('docs', [])),
+        "per_page": per_page,
+        "total": resposta.get('numFound', 0)
+    }
+    if posicao is None:
+        resultado["page"] = page
+    else:
+        proximo = dados.get('nextCursorMark')
+        fim = proximo is None or proximo == params['cursorMark']
+        resultado["next_cursor"] = None if fim else codificar_cursor(chave, m=proximo)
+    return resultado
+
+
+class Replica:
+    """Réplica de leitura do Solr, com a carga e a saúde vistas por este worker."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ping_url = url.rstrip("/").rsplit("/", 1)[0] + "/admin/ping"
+        self.em_curso = 0
+        self.latencia = None  # média móvel exponencial (s) das consultas e pings bem-sucedidos
+        self.falhas = 0       # falhas seguidas
+        self.saudavel = True
+
+    def custo(self) -> float:
+        # Latência ponderada pela fila: uma réplica rápida recebe mais tráfego até a fila crescer
+        return (self.em_curso + 1) * (self.latencia or 0.0)
+
+
+class ReplicaSet:
+    """Escolha da réplica de cada consulta e controle da saúde das réplicas.
+
+    A escolha usa duas réplicas saudáveis sorteadas ("power of two choices")
+    e fica com a de menor custo (consultas em curso × latência média), o que
+    espalha a carga entre os workers sem que todos corram para a mesma.
+    Uma réplica é ejetada após `max_falhas` falhas seguidas ou um ping sem
+    resposta, e readmitida quando volta a responder ao ping. A verificação
+    roda em uma thread por processo, iniciada sob demanda (como o indexador),
+    e só existe com mais de uma réplica. Se todas estiverem ejetadas, as
+    consultas seguem para todas, e quem decide é o disjuntor.
+    """
+
+    ALFA = 0.3  # peso da amostra mais recente na média de latência
+
+    def __init__(self, urls: list, max_falhas: int = SOLR_REPLICA_MAX_FAILURES,
+                 intervalo: float = SOLR_HEALTH_INTERVAL, timeout: float = SOLR_HEALTH_TIMEOUT):
+        self.replicas = [Replica(url) for url in urls]
+        self.max_falhas = max_falhas
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.ejecoes = 0
+        self.readmissoes = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def escolher(self, excluir=()) -> Replica:
+        """Reserva uma réplica para a consulta; devolva com `concluir` ou `liberar`."""
+        if len(self.replicas) > 1 and self._pid != os.getpid():
+            self._iniciar_verificacao()
+        with self._lock:
+            restantes = [r for r in self.replicas if r not in excluir]
+            candidatas = [r for r in restantes if r.saudavel] or restantes
+            if len(candidatas) > 2:
+                candidatas = random.sample(candidatas, 2)
+            replica = min(candidatas, key=Replica.custo)
+            replica.em_curso += 1
+            return replica
+
+    def liberar(self, replica: Replica):
+        """Devolve a réplica sem contar sucesso nem falha (ex.: chamada recusada pelo disjuntor)."""
+        with self._lock:
+            replica.em_curso -= 1
+
+    def concluir(self, replica: Replica, duracao: float, sucesso: bool):
+        with self._lock:
+            replica.em_curso -= 1
+            if sucesso:
+                replica.falhas = 0
+                self._amostrar(replica, duracao)
+                return
+            replica.falhas += 1
+            if replica.falhas >= self.max_falhas:
+                self._ejetar(replica)
+
+    def _amostrar(self, replica: Replica, duracao: float):
+        replica.latencia = duracao if replica.latencia is None else replica.latencia + self.ALFA * (duracao - replica.latencia)
+
+    def _ejetar(self, replica: Replica):
+        if replica.saudavel:
+            replica.saudavel = False
+            self.ejecoes += 1
+            observar_replica(replica.url, False)
+
+    def _iniciar_verificacao(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        for replica in self.replicas:
+            observar_replica(replica.url, replica.saudavel)
+        threading.Thread(target=self._verificar, name="solr-health", daemon=True).start()
+
+    def _verificar(self):
+        # Sessão própria e fora do disjuntor: um nó fora do ar não deve abrir o circuito dos demais
+        sessao = requests.Session()
+        while True:
+            for replica in self.replicas:
+                inicio = time.perf_counter()
+                try:
+                    ok = sessao.get(replica.ping_url, timeout=self.timeout).ok
+                except requests.exceptions.RequestException:
+                    ok = False
+                with self._lock:
+                    if not ok:
+                        self._ejetar(replica)
+                        continue
+                    replica.falhas = 0
+                    # O ping também renova a latência de réplicas que deixaram de receber consultas
+                    self._amostrar(replica, time.perf_counter() - inicio)
+                    if not replica.saudavel:
+                        replica.saudavel = True
+                        self.readmissoes += 1
+                        observar_replica(replica.url, True)
+            time.sleep(self.intervalo)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replicas": [{
+                    "url": r.url,
+                    "saudavel": r.saudavel,
+                    "em_curso": r.em_curso,
+                    "latencia_ms": round(r.latencia * 1000, 3) if r.latencia is not None else None,
+                    "falhas_seguidas": r.falhas
+                } for r in self.replicas],
+                "ejecoes": self.ejecoes,
+                "readmissoes": self.readmissoes
+            }
+
+
+class SolrClient:
+    """Cliente HTTP do Solr com pool de conexões keep-alive.
+
+    Cada processo (worker do uWSGI) e cada thread recebe a sua própria
+    `requests.Session`, criada sob demanda. Assim o pool nunca é herdado
+    do processo master após o fork nem compartilhado entre threads.
+    Somente chamadas idempotentes (GET/HEAD) são repetidas com backoff.
+
+    Com um `breaker`, as chamadas passam pelo disjuntor: erros de conexão,
+    timeouts e respostas 5xx contam como falha, e com o disjuntor aberto
+    a chamada levanta `SolrIndisponivel` sem tocar a rede.
+
+    Consultas (`select`) vão para uma das réplicas de `query_urls`; se a
+    escolhida falhar, a consulta é repetida uma vez em outra réplica, dentro
+    do mesmo prazo. Atualizações vão sempre para `update_url` (o líder).
+    """
+
+    def __init__(self, query_urls=SOLR_QUERY_URLS, update_url=SOLR_UPDATE_URL,
+                 pool_size=SOLR_POOL_SIZE, connect_timeout=SOLR_CONNECT_TIMEOUT,
+                 read_timeout=SOLR_READ_TIMEOUT, retries=SOLR_RETRIES,
+                 backoff=SOLR_RETRY_BACKOFF, breaker: CircuitBreaker = None):
+        self.replicas = ReplicaSet(query_urls)
+        self.update_url = update_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker
+        self._local = threading.local()
+
+    def _new_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False
+        )
+        # Um pool por host (réplicas + líder); com menos, as conexões keep-alive seriam descartadas ao alternar
+        adapter = HTTPAdapter(pool_connections=len(self.replicas.replicas) + 1, pool_maxsize=self.pool_size,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Connection": "keep-alive"})
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        # O pid é verificado para descartar sessões herdadas do master após o fork
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.session = self._new_session()
+            self._local.pid = pid
+        return self._local.session
+
+    def request(self, method: str, url: str, prazo: float = None, **kwargs) -> requests.Response:
+        if prazo is not None:
+            # O prazo vale para a chamada inteira: cada tentativa recebe uma fração dele
+            tentativa = prazo / (self.retries + 1)
+            kwargs["timeout"] = (min(self.timeout[0], tentativa), min(self.timeout[1], tentativa))
+        kwargs.setdefault("timeout", self.timeout)
+
+        breaker = self.breaker
+        ficha = breaker.permitir() if breaker is not None else None
+        if breaker is not None and ficha is None:
+            observar_disjuntor(breaker.estado, recusada=True)
+            restante = breaker.restante_aberto()
+            raise SolrIndisponivel(f"Disjuntor do Solr aberto (próxima tentativa em {restante:.1f}s)",
+                                   retry_after=restante)
+
+        inicio = time.perf_counter()
+        erro = falha = True
+        try:
+            response = self.session.request(method, url, **kwargs)
+            erro = response.status_code >= 400
+            falha = response.status_code >= 500
+            return response
+        finally:
+            duracao = time.perf_counter() - inicio
+            observar_solr(method, url, duracao, erro)
+            if breaker is not None:
+                # Só as consultas contam como lentas: envios em lote ao /update demoram por natureza
+                breaker.registrar(ficha, falha, duracao if method in ("GET", "HEAD") else 0.0)
+                observar_disjuntor(breaker.estado)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def select(self, params: dict, prazo: float = None) -> dict:
+        """Executa uma consulta no handler /select de uma réplica e retorna o JSON."""
+        limite = None if prazo is None else time.monotonic() + prazo
+        tentadas = []
+        while True:
+            replica = self.replicas.escolher(excluir=tentadas)
+            tentadas.append(replica)
+            restante = None if limite is None else max(limite - time.monotonic(), 0.001)
+            inicio = time.perf_counter()
+            try:
+                response = self.get(replica.url, params={**params, "wt": "json"}, prazo=restante)
+            except SolrIndisponivel:
+                self.replicas.liberar(replica)
+                raise
+            except requests.exceptions.RequestException:
+                self.replicas.concluir(replica, time.perf_counter() - inicio, False)
+                if not self._outra_replica(tentadas, limite):
+                    raise
+                continue
+            falhou = response.status_code >= 500
+            self.replicas.concluir(replica, time.perf_counter() - inicio, not falhou)
+            if falhou and self._outra_replica(tentadas, limite):
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _outra_replica(self, tentadas: list, limite: float) -> bool:
+        # No máximo uma nova tentativa, em outra réplica e só se ainda houver prazo
+        return (len(tentadas) < min(2, len(self.replicas.replicas))
+                and (limite is None or time.monotonic() < limite))
+
+    def update(self, payload, params: dict = None) -> requests.Response:
+        """Envia documentos/comandos JSON para o handler /update."""
+        response = self.post(self.update_url, json=payload, params=params,
+                             headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        return response
+
+
+solr = SolrClient(breaker=CircuitBreaker(
+    janela=SOLR_BREAKER_WINDOW,
+    minimo_chamadas=SOLR_BREAKER_MIN_CALLS,
+    taxa_erro=SOLR_BREAKER_ERROR_RATE,
+    taxa_lenta=SOLR_BREAKER_SLOW_RATE,
+    limite_lenta=SOLR_BREAKER_SLOW_CALL,
+    tempo_aberto=SOLR_BREAKER_OPEN_SECONDS,
+    sondas=SOLR_BREAKER_PROBES
+) if SOLR_BREAKER_ENABLED else None)
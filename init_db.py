@@ -1,82 +1,198 @@
+import argparse
 import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import os
 
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
 
 from helpers.application import app
+from helpers.bulk import upsert_cbos, remover_cbos, registrar_alteracoes, sincronizar_sequencia
+from helpers.cache import versao_dataset
 from helpers.database import db
 from helpers.logging import log_exception
+from helpers.solr import solr, documento
 
-from models import CBO
 from models.CBO import CBO
 
-SOLR_UPDATE_URL = os.getenv("SOLR_UPDATE_URL")
-
-print("Iniciando a criação e população do banco de dados...")
-
-with app.app_context():
-    # --- Inserção de dados ---
-
-    # 1. Inserir CBOs
-    print("Populando tabela tb_cbo...")
-    cbos_to_add = []
-
-    try:
-        with open("data/cbo2002-ocupacao.csv", "r", encoding="iso-8859-1") as f:
-            csv_reader = csv.DictReader(f, delimiter=';')
-            for row in csv_reader:
-                cbo_obj = CBO(
-                    cod_cbo=int(row['CODIGO']),
-                    titulo=row['TITULO']
-                )
-                cbos_to_add.append(cbo_obj)
-        db.session.bulk_save_objects(cbos_to_add)
-
-        # Sincroniza a sequência com o valor máximo do cod_cbo
-        db.session.execute(text("SELECT setval('public.tb_cbo_cod_cbo_seq', (SELECT MAX(cod_cbo) FROM tb_cbo))"))
-
-        db.session.commit()
-        print(f"Inseridos {len(cbos_to_add)} registros do CBO.")
-    except SQLAlchemyError:
-        db.session.rollback()
-        log_exception("Erro SQLAlchemy ao popular tb_cbo")
-    except Exception:
-        db.session.rollback()
-        log_exception("Erro ao processar CSV")
-
-    # 2. Indexar CBOs no Solr
-    print("Indexando documentos no Solr...")
-    solr_documents = []
-    
-    try:
-        cbos_db = db.session.execute(db.select(CBO)).scalars().all() 
-
-        for cbo in cbos_db:
-            solr_documents.append({
-                "id": str(cbo.cod_cbo),
-                "cod_cbo": cbo.cod_cbo,
-                "titulo": cbo.titulo
-            })
-
-        # Envia os documentos para o Solr via API JSON
-        response = requests.post(
-            SOLR_UPDATE_URL,
-            json=solr_documents,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        if response.status_code == 200:
-            print(f"Sucesso ao indexar {len(solr_documents)} documentos no Solr.")
-        else:
-            print(f"ERRO ao indexar no Solr: Status {response.status_code}, Resposta: {response.text}")
-    except SQLAlchemyError:
-        db.session.rollback()
-        log_exception("Erro SQLAlchemy ao popular tb_cbo")        
-    except requests.exceptions.ConnectionError:
-        log_exception("ERRO: Não foi possível conectar ao Solr. Verifique se o container 'solr' está rodando e acessível.")
-    except Exception:
-        log_exception("Erro inesperado durante a indexação Solr")     
-
-print("Banco e Solr inicializados com sucesso.")
\ No newline at end of file
+
+class Progresso:
+    """Acompanha linhas processadas e vazão de uma etapa da carga."""
+
+    def __init__(self, etapa: str, intervalo: int):
+        self.etapa = etapa
+        self.intervalo = intervalo
+        self.total = 0
+        self.inicio = time.monotonic()
+        self._proximo = intervalo
+        self._lock = threading.Lock()
+
+    def avancar(self, quantidade: int):
+        with self._lock:
+            self.total += quantidade
+            if self.total >= self._proximo:
+                self._proximo += self.intervalo
+                print(f"[{self.etapa}] {self.total} registros ({self.vazao():.0f} registros/s)")
+
+    def vazao(self) -> float:
+        decorrido = time.monotonic() - self.inicio
+        return self.total / decorrido if decorrido > 0 else 0.0
+
+    def concluir(self):
+        decorrido = time.monotonic() - self.inicio
+        print(f"[{self.etapa}] Concluído: {self.total} registros em {decorrido:.2f}s ({self.vazao():.0f} registros/s)")
+
+
+def ler_csv(caminho, encoding, delimitador, coluna_codigo, coluna_titulo, lote):
+    """Lê o CSV em streaming, gerando blocos de até `lote` linhas.
+
+    Códigos repetidos dentro de um bloco são consolidados (vale a última
+    ocorrência), já que um mesmo `INSERT ... ON CONFLICT` não pode
+    alterar a mesma linha duas vezes. Só são aceitos códigos de ocupação
+    (6 dígitos): um arquivo de famílias ou sinônimos levanta ValueError.
+    """
+    with open(caminho, "r", encoding=encoding, newline="") as f:
+        bloco = {}
+        leitor = csv.DictReader(f, delimiter=delimitador)
+        for row in leitor:
+            codigo = row[coluna_codigo].strip()
+            if not (len(codigo) == 6 and codigo.isascii() and codigo.isdigit()):
+                raise ValueError(f"Linha {leitor.line_num}: '{codigo}' não é um código de ocupação (6 dígitos)")
+            cod_cbo = int(codigo)
+            bloco[cod_cbo] = {"cod_cbo": cod_cbo, "titulo": row[coluna_titulo].strip()}
+            if len(bloco) >= lote:
+                yield list(bloco.values())
+                bloco = {}
+        if bloco:
+            yield list(bloco.values())
+
+
+def carregar_banco(args) -> int:
+    """Deixa tb_cbo igual ao CSV, com upserts em blocos (pode ser reexecutado).
+
+    CBOs que não estão no arquivo são removidas e as remoções entram na
+    outbox do Solr, já que a reindexação só envia o que está no banco. Tudo
+    em uma única transação: um código inválido no arquivo desfaz a carga.
+    """
+    progresso = Progresso("Banco", args.lote * 5)
+    carregados = set()
+    for bloco in ler_csv(args.arquivo, args.encoding, args.delimitador,
+                         args.coluna_codigo, args.coluna_titulo, args.lote):
+        upsert_cbos(bloco)
+        carregados.update(linha["cod_cbo"] for linha in bloco)
+        progresso.avancar(len(bloco))
+
+    ausentes = sorted(set(db.session.execute(db.select(CBO.cod_cbo)).scalars()) - carregados)
+    for inicio in range(0, len(ausentes), args.lote):
+        removidos = remover_cbos(ausentes[inicio:inicio + args.lote])
+        registrar_alteracoes([(cod_cbo, "delete") for cod_cbo in removidos])
+    if ausentes:
+        print(f"[Banco] {len(ausentes)} CBOs ausentes do CSV removidas")
+
+    # Sincroniza a sequência com o valor máximo do cod_cbo
+    sincronizar_sequencia()
+    db.session.commit()
+    versao_dataset.incrementar()
+    progresso.concluir()
+    return progresso.total
+
+
+def indexar_solr(args) -> int:
+    """Envia tb_cbo ao Solr em lotes fixos, com poucos envios em paralelo.
+
+    As linhas são lidas do banco com cursor no servidor e no máximo
+    `2 * workers` lotes ficam em memória ao mesmo tempo. O commit é feito
+    uma única vez, ao final.
+    """
+    progresso = Progresso("Solr", args.solr_lote * 5)
+    vagas = threading.BoundedSemaphore(args.workers * 2)
+
+    def enviar(documentos):
+        try:
+            solr.update(documentos)
+            progresso.avancar(len(documentos))
+        finally:
+            vagas.release()
+
+    resultado = db.session.execute(
+        db.select(CBO.cod_cbo, CBO.titulo)
+        .order_by(CBO.cod_cbo)
+        .execution_options(yield_per=args.solr_lote)
+    )
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        envios = []
+        for linhas in resultado.partitions():
+            vagas.acquire()
+            envios.append(executor.submit(enviar, [documento(c, t) for c, t in linhas]))
+            # Propaga cedo a falha de um lote já concluído
+            for envio in [e for e in envios if e.done()]:
+                envio.result()
+                envios.remove(envio)
+        for envio in envios:
+            envio.result()
+
+    solr.update({"commit": {}})
+    progresso.concluir()
+    return progresso.total
+
+
+def adicionar_argumentos(parser: argparse.ArgumentParser):
+    """Opções de leitura do CSV e de lotes, compartilhadas com o `startup.py`."""
+    parser.add_argument("--arquivo", default="data/cbo2002-ocupacao.csv")
+    parser.add_argument("--encoding", default="iso-8859-1")
+    parser.add_argument("--delimitador", default=";")
+    parser.add_argument("--coluna-codigo", default="CODIGO")
+    parser.add_argument("--coluna-titulo", default="TITULO")
+    parser.add_argument("--lote", type=int, default=1000, help="linhas por upsert no banco")
+    parser.add_argument("--solr-lote", type=int, default=500, help="documentos por envio ao Solr")
+    parser.add_argument("--workers", type=int, default=4, help="envios simultâneos ao Solr")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carrega CBOs de um CSV no banco e indexa no Solr.")
+    adicionar_argumentos(parser)
+    parser.add_argument("--sem-banco", action="store_true", help="apenas reindexa o Solr")
+    parser.add_argument("--sem-solr", action="store_true", help="apenas carrega o banco")
+    args = parser.parse_args()
+
+    print("Iniciando a criação e população do banco de dados...")
+
+    with app.app_context():
+        # 1. Inserir/atualizar CBOs
+        if not args.sem_banco:
+            print(f"Populando tabela tb_cbo a partir de {args.arquivo}...")
+            try:
+                total = carregar_banco(args)
+                print(f"Inseridos/atualizados {total} registros do CBO.")
+            except SQLAlchemyError:
+                db.session.rollback()
+                log_exception("Erro SQLAlchemy ao popular tb_cbo")
+                return
+            except Exception:
+                db.session.rollback()
+                log_exception("Erro ao processar CSV")
+                return
+
+        # 2. Indexar CBOs no Solr
+        if not args.sem_solr:
+            print("Indexando documentos no Solr...")
+            try:
+                total = indexar_solr(args)
+                print(f"Sucesso ao indexar {total} documentos no Solr.")
+            except SQLAlchemyError:
+                db.session.rollback()
+                log_exception("Erro SQLAlchemy ao ler tb_cbo")
+            except requests.exceptions.ConnectionError:
+                log_exception("ERRO: Não foi possível conectar ao Solr. Verifique se o container 'solr' está rodando e acessível.")
+            except requests.exceptions.HTTPError as e:
+                log_exception(f"ERRO ao indexar no Solr: Status {e.response.status_code}, Resposta: {e.response.text}")
+            except Exception:
+                log_exception("Erro inesperado durante a indexação Solr")
+
+    print("Banco e Solr inicializados com sucesso.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Mapped, mapped_column
 
 from helpers.database import db
+from helpers.serialization import compilar
 
 from flask_restful import fields
 
@@ -9,8 +10,15 @@ cbo_fields = {
     'titulo': fields.String
 }
 
+# Equivalente pré-compilado de `marshal(..., cbo_fields)`, usado nos caminhos quentes
+serializar_cbo = compilar(cbo_fields)
+
 class CBO(db.Model):
     __tablename__ = "tb_cbo"
+    __table_args__ = (
+        # Sustenta a ordenação da listagem e a paginação keyset (after=)
+        db.Index("ix_tb_cbo_titulo_cod_cbo", "titulo", "cod_cbo"),
+    )
 
     cod_cbo: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     titulo: Mapped[str] = mapped_column()
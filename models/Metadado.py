@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from helpers.database import db
+
+class Metadado(db.Model):
+    """Par chave/valor de controle da aplicação.
+
+    Guarda, por exemplo, a impressão digital da última carga do CSV, usada
+    pelo `startup.py` para não recarregar o banco nem reindexar o Solr à toa.
+    """
+    __tablename__ = "tb_metadados"
+
+    chave: Mapped[str] = mapped_column(primary_key=True)
+    valor: Mapped[str] = mapped_column()  # JSON
+    atualizado_em: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<Metadado(chave='{self.chave}')>"
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from helpers.database import db
+
+class SolrOutbox(db.Model):
+    """Alteração de CBO pendente de indexação no Solr.
+
+    Gravada na mesma transação da escrita em tb_cbo e consumida em lotes
+    pelo indexador em segundo plano (helpers.indexer).
+    """
+    __tablename__ = "tb_solr_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    cod_cbo: Mapped[int] = mapped_column()
+    operacao: Mapped[str] = mapped_column()  # "upsert" ou "delete"
+    criado_em: Mapped[datetime] = mapped_column(server_default=func.now())
+    tentativas: Mapped[int] = mapped_column(default=0, server_default="0")  # envios com falha, de qualquer tipo
+    recusas: Mapped[int] = mapped_column(default=0, server_default="0")  # só as recusas (4xx) do Solr
+
+    def __repr__(self):
+        return f"<SolrOutbox(id={self.id}, cod_cbo={self.cod_cbo}, operacao='{self.operacao}')>"
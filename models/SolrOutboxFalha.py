@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from helpers.database import db
+
+class SolrOutboxFalha(db.Model):
+    """Alteração da outbox que o Solr recusou SOLR_INDEXER_MAX_ATTEMPTS vezes.
+
+    Sai de tb_solr_outbox para não travar a fila; fica aqui para análise e
+    reprocessamento manual (basta recriar a linha na outbox).
+    """
+    __tablename__ = "tb_solr_outbox_falhas"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    cod_cbo: Mapped[int] = mapped_column()
+    operacao: Mapped[str] = mapped_column()
+    criado_em: Mapped[datetime] = mapped_column()  # da entrada original na outbox
+    tentativas: Mapped[int] = mapped_column()
+    erro: Mapped[str] = mapped_column()  # última resposta de erro do Solr
+    descartado_em: Mapped[datetime] = mapped_column(server_default=func.now())
+
+    def __repr__(self):
+        return f"<SolrOutboxFalha(id={self.id}, cod_cbo={self.cod_cbo}, operacao='{self.operacao}')>"
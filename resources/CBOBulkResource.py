@@ -0,0 +1,120 @@
+from flask import request, Response, stream_with_context
+from flask_restful import Resource
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import json
+
+from helpers.bulk import (BULK_CHUNK_SIZE, upsert_cbos, remover_cbos,
+                          registrar_alteracoes, sincronizar_sequencia)
+from helpers.cache import versao_dataset
+from helpers.database import db
+from helpers.indexer import indexador
+from helpers.logging import logger, log_exception
+
+def _ler_operacoes(stream):
+    """Lê o corpo NDJSON linha a linha, sem carregá-lo inteiro em memória.
+
+    Gera tuplas `(numero_linha, operacao, erro)`.
+    """
+    for numero, linha in enumerate(stream, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            item = json.loads(linha)
+        except ValueError:
+            yield numero, None, "JSON inválido."
+            continue
+        if not isinstance(item, dict):
+            yield numero, None, "Cada linha deve ser um objeto JSON."
+            continue
+
+        op = item.get("op", "upsert")
+        cod_cbo = item.get("cod_cbo")
+        if op not in ("upsert", "delete"):
+            yield numero, item, "Operação deve ser 'upsert' ou 'delete'."
+        elif not isinstance(cod_cbo, int) or isinstance(cod_cbo, bool):
+            yield numero, item, "Campo 'cod_cbo' inteiro é obrigatório."
+        elif op == "upsert" and not isinstance(item.get("titulo"), str):
+            yield numero, item, "Campo 'titulo' é obrigatório para upsert."
+        else:
+            yield numero, item, None
+
+def _resultado(numero, item, status, mensagem=None):
+    resultado = {"linha": numero, "status": status}
+    if item is not None:
+        resultado["op"] = item.get("op", "upsert")
+        resultado["cod_cbo"] = item.get("cod_cbo")
+    if mensagem:
+        resultado["mensagem"] = mensagem
+    return resultado
+
+def _ndjson(obj):
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+def _aplicar_bloco(bloco):
+    """Aplica um bloco de operações (códigos distintos) em uma transação."""
+    if not bloco:
+        return
+    upserts = [{"cod_cbo": item["cod_cbo"], "titulo": item["titulo"]}
+               for _, item in bloco if item.get("op", "upsert") == "upsert"]
+    deletes = [item["cod_cbo"] for _, item in bloco if item.get("op") == "delete"]
+
+    try:
+        upsert_cbos(upserts)
+        removidos = remover_cbos(deletes)
+        registrar_alteracoes(
+            [(linha["cod_cbo"], "upsert") for linha in upserts] +
+            [(cod_cbo, "delete") for cod_cbo in removidos]
+        )
+        if upserts:
+            sincronizar_sequencia()
+        db.session.commit()
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao aplicar bloco de operações em lote.")
+        db.session.rollback()
+        for numero, item in bloco:
+            yield _resultado(numero, item, "erro", "Problema com o banco de dados.")
+        return
+
+    versao_dataset.incrementar()
+    indexador.notificar()
+    for numero, item in bloco:
+        if item.get("op") == "delete" and item["cod_cbo"] not in removidos:
+            yield _resultado(numero, item, "erro", "CBO não encontrada.")
+        else:
+            yield _resultado(numero, item, "ok")
+
+class CbosBulkResource(Resource):
+    def post(self):
+        logger.info("Post - Operações em lote (NDJSON)")
+        stream = request.stream
+
+        def resultados():
+            bloco, codigos = [], set()
+
+            for numero, item, erro in _ler_operacoes(stream):
+                if erro:
+                    yield _resultado(numero, item, "erro", erro)
+                    continue
+                # Código repetido no bloco: aplica o bloco antes para preservar a ordem
+                if item["cod_cbo"] in codigos or len(bloco) >= BULK_CHUNK_SIZE:
+                    yield from _aplicar_bloco(bloco)
+                    bloco, codigos = [], set()
+                bloco.append((numero, item))
+                codigos.add(item["cod_cbo"])
+
+            yield from _aplicar_bloco(bloco)
+
+        def processar():
+            total = erros = 0
+            for resultado in resultados():
+                total += 1
+                erros += resultado["status"] == "erro"
+                yield _ndjson(resultado)
+
+            logger.info(f"Operações em lote concluídas: {total} operações, {erros} com erro")
+            yield _ndjson({"resumo": {"total": total, "ok": total - erros, "erros": erros}})
+
+        return Response(stream_with_context(processar()), mimetype="application/x-ndjson")
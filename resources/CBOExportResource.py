@@ -0,0 +1,77 @@
+from flask import request, Response, abort, stream_with_context
+from flask_restful import Resource
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import csv
+import io
+import json
+import os
+
+from helpers.cache import versao_dataset
+from helpers.database import db
+from helpers.http_cache import etag_atual, HTTP_CACHE_CONTROL
+from helpers.logging import logger, log_exception
+
+from models.CBO import CBO
+
+# Linhas lidas do cursor no servidor por vez (e enviadas em cada pedaço da resposta)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+def _ndjson(linhas):
+    return "".join(json.dumps({"cod_cbo": cod_cbo, "titulo": titulo}, ensure_ascii=False) + "\n"
+                   for cod_cbo, titulo in linhas)
+
+def _csv(linhas):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(linhas)
+    return buffer.getvalue()
+
+class CbosExportResource(Resource):
+    def get(self):
+        formato = request.args.get('format', "ndjson").lower()
+        if formato not in FORMATOS:
+            abort(400, description="Formato deve ser 'ndjson' ou 'csv'.")
+
+        # A versão do dataset identifica o conteúdo: sem escritas, o export é o mesmo
+        versao = versao_dataset.atual()
+        etag = etag_atual()
+        cabecalhos = {"X-Dataset-Version": str(versao), "Cache-Control": HTTP_CACHE_CONTROL}
+        if request.if_none_match.contains_weak(etag):
+            logger.info(f"Export {formato} inalterado (versão {versao})")
+            response = Response(status=304, headers=cabecalhos)
+            response.set_etag(etag)
+            return response
+
+        logger.info(f"Export - Todas as CBOs em {formato}")
+
+        def gerar():
+            if formato == "csv":
+                yield _csv([("cod_cbo", "titulo")])
+            total = 0
+            try:
+                # yield_per usa um cursor no servidor: a memória não cresce com a tabela
+                resultado = db.session.execute(
+                    db.select(CBO.cod_cbo, CBO.titulo)
+                    .order_by(CBO.cod_cbo)
+                    .execution_options(yield_per=EXPORT_BATCH_SIZE)
+                )
+                for linhas in resultado.partitions():
+                    total += len(linhas)
+                    yield _csv(linhas) if formato == "csv" else _ndjson(linhas)
+            except SQLAlchemyError:
+                # O status já foi enviado; o cliente percebe o corte pelo fim do chunked
+                log_exception("Exception SQLAlchemy durante o export de CBOs.")
+                db.session.rollback()
+                raise
+            logger.info(f"Export concluído: {total} CBOs em {formato}")
+
+        response = Response(stream_with_context(gerar()), content_type=FORMATOS[formato], headers=cabecalhos)
+        response.set_etag(etag)
+        response.headers["Content-Disposition"] = f"attachment; filename=cbos.{formato}"
+        return response
@@ -0,0 +1,28 @@
+from flask import request, abort
+from flask_restful import Resource
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from helpers.database import db
+from helpers.hierarchy import facetas
+from helpers.logging import logger, log_exception
+
+class CbosFacetsResource(Resource):
+    def get(self):
+        grupo = request.args.get('grupo', "").strip()
+        if grupo and (not grupo.isdigit() or len(grupo) > 4):
+            abort(400, description="Grupo deve ter de 1 a 4 dígitos.")
+
+        logger.info("Get - Facetas da hierarquia CBO" + (f" do grupo {grupo}" if grupo else ""))
+        try:
+            niveis = facetas(grupo or None)
+        except SQLAlchemyError:
+            log_exception("Exception SQLAlchemy ao calcular as facetas da hierarquia.")
+            db.session.rollback()
+            abort(500, description="Problema com o banco de dados.")
+
+        return {
+            "grupo": grupo or None,
+            "total": sum(item["total"] for item in niveis["grande_grupo"]),
+            "niveis": niveis
+        }, 200
@@ -0,0 +1,62 @@
+from flask import request, abort
+from flask_restful import Resource
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import os
+
+from helpers.database import db
+from helpers.logging import logger, log_exception
+
+from models.CBO import serializar_cbo, CBO
+
+# Limite de códigos por requisição, para manter a consulta IN e a resposta pequenas
+MAX_LOOKUP_CODES = int(os.getenv("MAX_LOOKUP_CODES", 1000))
+
+def validar_codigos(codigos) -> list:
+    """Valida a lista de códigos recebida e remove repetições, preservando a ordem.
+
+    Só aceita inteiros de verdade: booleanos, números fracionários e textos são
+    recusados em vez de convertidos (2.9 não vira 2).
+    """
+    if not isinstance(codigos, list) or not codigos:
+        abort(400, description="Informe uma lista não vazia de códigos.")
+    if any(not isinstance(codigo, int) or isinstance(codigo, bool) for codigo in codigos):
+        abort(400, description="Os códigos devem ser inteiros.")
+    codigos = list(dict.fromkeys(codigos))
+    if len(codigos) > MAX_LOOKUP_CODES:
+        abort(400, description=f"No máximo {MAX_LOOKUP_CODES} códigos por requisição.")
+    return codigos
+
+def codigos_da_query(texto: str) -> list:
+    """Lista de `?codes=` separada por vírgulas; só dígitos viram inteiros."""
+    codigos = [codigo.strip() for codigo in texto.split(",") if codigo.strip()]
+    return [int(codigo) if codigo.isdecimal() else codigo for codigo in codigos]
+
+def buscar_por_codigos(codigos: list) -> dict:
+    """Resolve vários códigos com uma única consulta `IN`.
+
+    Retorna as CBOs encontradas na ordem pedida e os códigos ausentes.
+    """
+    logger.info(f"Lookup - {len(codigos)} códigos de CBO")
+    try:
+        encontradas = {
+            cbo.cod_cbo: cbo for cbo in db.session.execute(
+                db.select(CBO).where(CBO.cod_cbo.in_(codigos))
+            ).scalars()
+        }
+    except SQLAlchemyError:
+        log_exception("Exception SQLAlchemy ao buscar CBOs por códigos.")
+        db.session.rollback()
+        abort(500, description="Problema com o banco de dados.")
+
+    return {
+        "CBOs": serializar_cbo([encontradas[c] for c in codigos if c in encontradas]),
+        "nao_encontrados": [c for c in codigos if c not in encontradas]
+    }
+
+class CbosLookupResource(Resource):
+    def post(self):
+        dados = request.get_json(silent=True)
+        codigos = dados.get("codes") if isinstance(dados, dict) else dados
+        return buscar_por_codigos(validar_codigos(codigos)), 200
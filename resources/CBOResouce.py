@@ -1,71 +1,136 @@
-from flask import request, abort
-from flask_restful import Resource, marshal
+from flask import g, request, abort
+from flask_restful import Resource
 
 from sqlalchemy.exc import SQLAlchemyError
 
-import requests
 import os
+import requests
 
+from helpers.cache import cache_busca, cache_total, versao_dataset
 from helpers.database import db
+from helpers.hierarchy import faixa_grupo
+from helpers.indexer import indexador, registrar_alteracao
 from helpers.logging import logger, log_exception
+from helpers.pagination import codificar_cursor, decodificar_cursor, CursorInvalido
+from helpers.search import indice, SEARCH_BACKEND
+from helpers.snapshot import snapshot
+from helpers.solr import solr, parametros_busca, resultado_busca, SolrIndisponivel, SOLR_SEARCH_DEADLINE
 
-from models.CBO import cbo_fields, CBO
+from models.CBO import serializar_cbo, CBO
+from resources.CBOLookupResource import buscar_por_codigos, codigos_da_query, validar_codigos
 
-SOLR_QUERY_URL = os.getenv("SOLR_QUERY_URL")
-SOLR_UPDATE_URL = os.getenv("SOLR_UPDATE_URL")
+# Limite de itens por página, para que uma requisição não leve a tabela inteira
+MAX_PER_PAGE = int(os.getenv("MAX_PER_PAGE", 500))
+
+def _decodificar_cursor(token: str, chave: str) -> dict:
+    try:
+        return decodificar_cursor(token, chave)
+    except CursorInvalido as e:
+        abort(400, description=str(e))
 
 class CbosResouce(Resource):
     def get(self):
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 100))
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            per_page = min(max(int(request.args.get('per_page', 100)), 1), MAX_PER_PAGE)
+        except ValueError:
+            abort(400, description="Parâmetros de paginação inválidos.")
         search_query = request.args.get('q', "").strip()
+        cursor = request.args.get('cursor')
+        codes = request.args.get('codes')
+        grupo = request.args.get('grupo', "").strip()
+
+        if codes is not None:
+            return buscar_por_codigos(validar_codigos(codigos_da_query(codes))), 200
+
+        faixa = None
+        if grupo:
+            try:
+                faixa = faixa_grupo(grupo)
+            except ValueError as e:
+                abort(400, description=str(e))
 
         if search_query:
+            # Consultas iguais (ignorando caixa e espaços) compartilham o mesmo resultado
+            chave = " ".join(search_query.lower().split())
+            if grupo:
+                chave += f" grupo:{grupo}"
+            posicao = _decodificar_cursor(cursor, chave) if cursor else None
+
+            # Cada backend só continua os próprios cursores: `m` (cursorMark do Solr)
+            # ou `o` (deslocamento no índice local); trocar no meio duplicaria itens
+            if posicao and "o" in posicao:
+                if SEARCH_BACKEND == "solr":
+                    abort(400, description="Cursor emitido por outro backend de busca; recomece com cursor=*.")
+                return self._busca_local(search_query, chave, page, per_page, posicao, faixa)
+
+            if SEARCH_BACKEND == "local":
+                if posicao and "m" in posicao:
+                    abort(400, description="Cursor emitido por outro backend de busca; recomece com cursor=*.")
+                return self._busca_local(search_query, chave, page, per_page, posicao, faixa)
+
             logger.info(f"Busca Solr: '{search_query}'")
             try:
-                # 2. Monta e executa a requisição GET para o Solr
-                solr_params = {
-                    'q': f'titulo:{search_query}',  # Busca no campo 'titulo'
-                    'fl': 'cod_cbo, titulo',        # Retorna apenas estes campos
-                    'wt': 'json'                    # Formato de resposta JSON
-                }
-                
-                response = requests.get(SOLR_QUERY_URL, params=solr_params)
-                response.raise_for_status()
-                
-                solr_data = response.json()
-                solr_results = solr_data.get('response', {}).get('docs', [])
-                
-                # 3. Transforma o resultado do Solr para o formato da API
-                cbos_results = []
-                for doc in solr_results:
-                    cbos_results.append({
-                        'cod_cbo': doc['cod_cbo'],
-                        'titulo': doc['titulo']
-                    })
-                
-                logger.info(f"Solr retornou {len(cbos_results)} resultados para '{search_query}'")
-                return marshal(cbos_results, cbo_fields), 200
+                resultado = cache_busca.obter(
+                    (chave, page, per_page, cursor),
+                    lambda: self._busca_solr(search_query, chave, page, per_page, posicao, faixa)
+                )
+
+                logger.info(f"Solr retornou {len(resultado['CBOs'])} de {resultado['total']} resultados para '{search_query}'")
+                return resultado, 200
 
             except requests.exceptions.RequestException as e:
-                log_exception(f"Erro de conexão/requisição Solr: {e}")
-                abort(503, description="Serviço de busca (Solr) indisponível.")
+                retry_after = None
+                if isinstance(e, SolrIndisponivel):
+                    # Disjuntor aberto: falha na hora, sem traceback a cada requisição
+                    logger.warning(f"Busca Solr recusada: {e}")
+                    retry_after = max(int(e.retry_after + 0.999), 1)
+                else:
+                    log_exception(f"Erro de conexão/requisição Solr: {e}")
+                if SEARCH_BACKEND == "fallback" and not (posicao and "m" in posicao):
+                    logger.warning(f"Solr indisponível, usando índice local para '{search_query}'")
+                    g.resposta_degradada = True
+                    return self._busca_local(search_query, chave, page, per_page, posicao, faixa)
+                abort(503, description="Serviço de busca (Solr) indisponível.", retry_after=retry_after)
             except Exception:
                 log_exception("Erro inesperado na busca Solr")
                 abort(500, description="Ocorreu um erro inesperado na busca.")
         else:
-
-            # Contagem total filtrada
-            count_query = db.select(db.func.count()).select_from(CBO)
-            total = db.session.execute(count_query).scalar()
+            after = request.args.get('after')
+            posicao = _decodificar_cursor(after, grupo) if after else None
+            if posicao and not {"t", "c"} <= posicao.keys():
+                abort(400, description="Cursor inválido.")
 
             try:
-                logger.info(f"Get - Todas as CBOs")
-                cbos = db.session.execute(
-                    db.select(CBO)
-                    .order_by(CBO.titulo.asc())
-                    .offset((page - 1) * per_page).limit(per_page)
-                    ).scalars().all()
+                logger.info("Get - Todas as CBOs" + (f" do grupo {grupo}" if grupo else ""))
+                cbos = None
+                atual = snapshot.atual() if faixa is None else None
+                if atual is not None:
+                    # Listagem sem filtro servida do snapshot compartilhado, sem ir ao banco
+                    total = atual.total
+                    if posicao:
+                        cbos = atual.apos(posicao["t"], posicao["c"], per_page)
+                    else:
+                        inicio = (page - 1) * per_page if posicao is None else 0
+                        cbos = atual.pagina(inicio, per_page)
+
+                if cbos is None:
+                    filtro = CBO.cod_cbo.between(*faixa) if faixa else db.true()
+
+                    # Contagem total (por grupo), mantida em cache até a próxima escrita
+                    total = cache_total.obter(("total", faixa), lambda: db.session.execute(
+                        db.select(db.func.count()).select_from(CBO).where(filtro)
+                    ).scalar())
+
+                    consulta = db.select(CBO).where(filtro).order_by(CBO.titulo.asc(), CBO.cod_cbo.asc()).limit(per_page)
+                    if posicao:
+                        # Keyset: busca direto no índice (titulo, cod_cbo) a partir do último item visto
+                        consulta = consulta.where(
+                            db.tuple_(CBO.titulo, CBO.cod_cbo) > (posicao["t"], posicao["c"])
+                        )
+                    elif posicao is None:
+                        consulta = consulta.offset((page - 1) * per_page)
+                    cbos = serializar_cbo(db.session.execute(consulta).scalars().all())
 
                 if not cbos:
                     logger.warning(f"Nenhum CBO(Classificação Brasileira de Ocupações) encontrado.")
@@ -75,11 +140,18 @@ class CbosResouce(Resource):
                         "total": 0
                     }, 404
 
+                ultimo = cbos[-1]
+                next_after = (codificar_cursor(grupo, t=ultimo["titulo"], c=ultimo["cod_cbo"])
+                              if len(cbos) == per_page else None)
+
                 logger.info(f"CBOs retornadas com sucesso")
-                return { "CBOs": marshal(cbos, cbo_fields), 
-                        "page": page, 
+                resultado = { "CBOs": cbos, 
                         "per_page": per_page, 
-                        "total": total }, 200
+                        "total": total,
+                        "next_after": next_after }
+                if posicao is None:
+                    resultado["page"] = page
+                return resultado, 200
         
             except SQLAlchemyError:
                 log_exception("Exception SQLAlchemy ao buscar CBOs.")
@@ -89,6 +161,36 @@ class CbosResouce(Resource):
                 log_exception("Erro inesperado ao buscar CBOs")
                 abort(500, description="Ocorreu um erro inesperado.")
 
+    def _busca_solr(self, search_query, chave, page, per_page, posicao, faixa):
+        solr_params = parametros_busca(search_query, page, per_page, posicao, faixa)
+        return resultado_busca(solr.select(solr_params, prazo=SOLR_SEARCH_DEADLINE), solr_params, chave, page, per_page, posicao)
+
+    def _busca_local(self, search_query, chave, page, per_page, posicao, faixa=None):
+        logger.info(f"Busca local: '{search_query}'")
+        try:
+            encontrados = indice.buscar(search_query)
+        except SQLAlchemyError:
+            log_exception("Exception SQLAlchemy ao carregar o índice de busca local.")
+            db.session.rollback()
+            abort(503, description="Serviço de busca indisponível.")
+        if faixa:
+            encontrados = [cbo for cbo in encontrados if faixa[0] <= cbo["cod_cbo"] <= faixa[1]]
+
+        inicio = (page - 1) * per_page if posicao is None else posicao.get("o", 0)
+        cbos_results = encontrados[inicio:inicio + per_page]
+        resultado = {
+            "CBOs": serializar_cbo(cbos_results),
+            "per_page": per_page,
+            "total": len(encontrados)
+        }
+        if posicao is None:
+            resultado["page"] = page
+        else:
+            fim = inicio + per_page >= len(encontrados)
+            resultado["next_cursor"] = None if fim else codificar_cursor(chave, o=inicio + per_page)
+        logger.info(f"Índice local retornou {len(cbos_results)} de {len(encontrados)} resultados para '{search_query}'")
+        return resultado, 200
+
     def post(self):
         logger.info("Post - CBO")
         cbo_data = request.get_json()
@@ -97,24 +199,15 @@ class CbosResouce(Resource):
             nova_cbo = CBO(**cbo_data)
 
             db.session.add(nova_cbo)
+            db.session.flush()
+            # A indexação no Solr é feita pelo indexador a partir da outbox
+            registrar_alteracao(nova_cbo.cod_cbo, "upsert")
             db.session.commit()
-            
-            try:
-                doc_to_solr = [{
-                    "id": str(nova_cbo.cod_cbo),
-                    "cod_cbo": nova_cbo.cod_cbo,
-                    "titulo": nova_cbo.titulo
-                }]
-                solr_response = requests.post(SOLR_UPDATE_URL, 
-                                            json=doc_to_solr,
-                                            headers={'Content-Type': 'application/json'})
-                solr_response.raise_for_status()
-                logger.info(f"CBO {nova_cbo.cod_cbo} adicionada ao Solr com sucesso")
-            except requests.exceptions.RequestException as e:
-                log_exception(f"Erro ao adicionar CBO {nova_cbo.cod_cbo} ao Solr: {e}")
-                abort(503, description="Serviço de busca (Solr) indisponível.")
+            indice.atualizar(nova_cbo.cod_cbo, nova_cbo.titulo, versao_dataset.incrementar())
+            indexador.notificar()
+
             logger.info(f"Nova CBO com codigo {nova_cbo.cod_cbo} cadastrada com sucesso")
-            return marshal(nova_cbo, cbo_fields), 201
+            return serializar_cbo(nova_cbo), 201
         
         except SQLAlchemyError:
             log_exception("Exception SQLAlchemy ao inserir nova CBO.")
@@ -129,17 +222,21 @@ class CboResouce(Resource):
         logger.info(f"Get - CBO por código: {cod_cbo}")
 
         try:
-            cbo = db.session.execute(
-                db.select(CBO)
-                .filter_by(cod_cbo=cod_cbo)
-            ).scalar_one_or_none()
+            atual = snapshot.atual()
+            if atual is not None:
+                cbo = atual.buscar(cod_cbo)
+            else:
+                cbo = db.session.execute(
+                    db.select(CBO)
+                    .filter_by(cod_cbo=cod_cbo)
+                ).scalar_one_or_none()
 
             if cbo is None:
                 logger.warning(f"CBO com código {cod_cbo} não encontrada.")
                 return {"mensagem": "CBO não encontrada."}, 404
 
             logger.info(f"CBO com código {cod_cbo} retornada com sucesso")            
-            return marshal(cbo, cbo_fields), 200
+            return serializar_cbo(cbo), 200
 
         except SQLAlchemyError:
             log_exception("Exception SQLAlchemy ao buscar cbo por código.")
@@ -172,32 +269,17 @@ class CboResouce(Resource):
                     if valor_antigo != value:
                         setattr(cbo, key, value)
                         dados_alterados = True
-                        if key == 'titulo':
-                            titulo_novo = value
 
             if not dados_alterados:
                 logger.info(f"Nenhuma alteração detectada para CBO {cod_cbo}")
                 return {"mensagem": "Nenhuma alteração necessária."}, 200
 
+            # Atualiza no Solr (via outbox) se houve alguma mudança
+            registrar_alteracao(cod_cbo, "upsert")
             db.session.commit()
+            indice.atualizar(cod_cbo, cbo.titulo, versao_dataset.incrementar())
+            indexador.notificar()
 
-            # Atualiza no Solr se o título foi alterado ou se houve alguma mudança
-            try:
-                # Prepara documento para atualização no Solr
-                doc_to_solr = [{
-                    "id": str(cod_cbo),
-                    "cod_cbo": cod_cbo,
-                    "titulo": titulo_novo if 'titulo_novo' in locals() else cbo.titulo
-                }]
-                
-                solr_response = requests.post(SOLR_UPDATE_URL, 
-                                            json=doc_to_solr,
-                                            headers={'Content-Type': 'application/json'})
-                solr_response.raise_for_status()
-                logger.info(f"CBO {cod_cbo} atualizada no Solr com sucesso")
-            except requests.exceptions.RequestException as e:
-                log_exception(f"Erro ao atualizar CBO {cod_cbo} no Solr: {e}")
-                abort(503, description="Serviço de busca (Solr) indisponível.")
             logger.info(f"CBO com código {cod_cbo} atualizada com sucesso.")
             return {"mensagem": "CBO atualizada com sucesso."}, 200
         
@@ -223,23 +305,12 @@ class CboResouce(Resource):
                 return {"mensagem": "CBO não encontrada."}, 404
             
             db.session.delete(cbo)
+            # Remove do Solr (via outbox) na mesma transação da deleção
+            registrar_alteracao(cod_cbo, "delete")
             db.session.commit()
+            indice.remover(cod_cbo, versao_dataset.incrementar())
+            indexador.notificar()
 
-            # Remove do Solr após deletar do banco
-            try:
-                # Envia comando de delete para o Solr
-                delete_doc = {
-                    "delete": {"id": str(cod_cbo)}
-                }
-                
-                solr_response = requests.post(SOLR_UPDATE_URL, 
-                                            json=delete_doc,
-                                            headers={'Content-Type': 'application/json'})
-                solr_response.raise_for_status()
-                logger.info(f"CBO {cod_cbo} removida do Solr com sucesso")
-            except requests.exceptions.RequestException as e:
-                log_exception(f"Erro ao remover CBO {cod_cbo} do Solr: {e}")
-                abort(503, description="Serviço de busca (Solr) indisponível.")
             logger.info(f"CBO com código {cod_cbo} removida com sucesso.")
             return {"mensagem": "CBO removida com sucesso."}, 200
         
@@ -0,0 +1,66 @@
+from flask import g, request, abort
+from flask_restful import Resource
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import os
+import requests
+
+from helpers.cache import cache_sugestoes, versao_busca
+from helpers.database import db
+from helpers.logging import logger, log_exception
+from helpers.search import indice, normalizar, SUGGEST_BACKEND, TOKEN_RE
+from helpers.solr import solr, SolrIndisponivel, SOLR_SEARCH_DEADLINE
+
+from models.CBO import serializar_cbo
+
+SUGGEST_DEFAULT_K = int(os.getenv("SUGGEST_DEFAULT_K", 10))
+SUGGEST_MAX_K = int(os.getenv("SUGGEST_MAX_K", 50))
+
+class CbosSuggestResource(Resource):
+    def get(self):
+        prefixo = request.args.get('prefix', "").strip()
+        try:
+            k = min(max(int(request.args.get('k', SUGGEST_DEFAULT_K)), 1), SUGGEST_MAX_K)
+        except ValueError:
+            abort(400, description="Parâmetro k deve ser um número inteiro.")
+
+        if not prefixo:
+            return {"sugestoes": []}, 200
+
+        chave = (" ".join(TOKEN_RE.findall(normalizar(prefixo))), k)
+
+        if SUGGEST_BACKEND == "solr":
+            try:
+                sugestoes = cache_sugestoes.obter(("solr",) + chave, lambda: self._sugerir_solr(prefixo, k),
+                                                  versao=versao_busca)
+                return {"sugestoes": sugestoes}, 200
+            except SolrIndisponivel as e:
+                logger.warning(f"Sugestões via Solr recusadas, usando índice local: {e}")
+            except requests.exceptions.RequestException as e:
+                log_exception(f"Erro nas sugestões via Solr, usando índice local: {e}")
+            g.resposta_degradada = True
+
+        try:
+            sugestoes = cache_sugestoes.obter(
+                ("local",) + chave, lambda: serializar_cbo(indice.sugerir(prefixo, k))
+            )
+            return {"sugestoes": sugestoes}, 200
+        except SQLAlchemyError:
+            log_exception("Exception SQLAlchemy ao carregar o índice de sugestões.")
+            db.session.rollback()
+            abort(503, description="Serviço de sugestões indisponível.")
+
+    def _sugerir_solr(self, prefixo, k):
+        # Os tokens contêm apenas letras/dígitos, então não há caracteres especiais a escapar
+        tokens = TOKEN_RE.findall(normalizar(prefixo))
+        solr_data = solr.select({
+            'q': f"titulo_prefixo:({' '.join(tokens)})",
+            'q.op': 'AND',
+            'fl': 'cod_cbo,titulo',
+            'rows': k,
+            'sort': 'score desc, id asc'
+        }, prazo=SOLR_SEARCH_DEADLINE)
+        docs = solr_data.get('response', {}).get('docs', [])
+        logger.info(f"Solr retornou {len(docs)} sugestões para '{prefixo}'")
+        return serializar_cbo(docs)
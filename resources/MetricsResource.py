@@ -0,0 +1,9 @@
+from flask import Response
+from flask_restful import Resource
+
+from helpers.metrics import gerar_metricas
+
+class MetricsResource(Resource):
+    def get(self):
+        conteudo, content_type = gerar_metricas()
+        return Response(conteudo, mimetype=content_type)
@@ -0,0 +1,35 @@
+from flask import request, abort, send_file
+from flask_restful import Resource
+
+from helpers.profiling import caminho_perfil, listar, token_da_requisicao, token_valido
+
+MAX_PROFILES_LIST = 200
+
+def _exigir_token():
+    # Sem o token o recurso se comporta como inexistente
+    if not token_valido(token_da_requisicao()):
+        abort(404)
+
+class ProfilesResource(Resource):
+    def get(self):
+        _exigir_token()
+        try:
+            limite = min(max(int(request.args.get('limit', 20)), 1), MAX_PROFILES_LIST)
+        except ValueError:
+            abort(400, description="Parâmetro limit deve ser um número inteiro.")
+        return {"perfis": listar(limite)}, 200
+
+class ProfileResource(Resource):
+    def get(self, perfil_id):
+        _exigir_token()
+        # ?formato=json devolve o resumo completo (SQL e funções); o padrão é o dump do pstats
+        formato = request.args.get('formato', 'prof')
+        if formato not in ("prof", "json"):
+            abort(400, description="Formato inválido: use prof ou json.")
+        caminho = caminho_perfil(perfil_id, formato)
+        if caminho is None:
+            return {"mensagem": "Perfil não encontrado."}, 404
+        if formato == "json":
+            return send_file(caminho, mimetype="application/json")
+        return send_file(caminho, mimetype="application/octet-stream", as_attachment=True,
+                         download_name=f"{perfil_id}.prof")
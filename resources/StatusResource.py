@@ -0,0 +1,28 @@
+from flask_restful import Resource
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from helpers.cache import cache_busca, cache_sugestoes
+from helpers.database import db
+from helpers.http_cache import cache_comprimido
+from helpers.indexer import estatisticas
+from helpers.logging import log_exception
+from helpers.solr import solr
+
+class StatusResource(Resource):
+    def get(self):
+        status = {
+            "cache_busca": cache_busca.stats(),
+            "cache_sugestoes": cache_sugestoes.stats(),
+            "cache_http": cache_comprimido.stats(),
+            # Estado do disjuntor do Solr neste worker
+            "solr_disjuntor": solr.breaker.stats() if solr.breaker is not None else None,
+            "solr_replicas": solr.replicas.stats()
+        }
+        try:
+            status["outbox_solr"] = estatisticas()
+        except SQLAlchemyError:
+            log_exception("Exception SQLAlchemy ao consultar a outbox do Solr.")
+            db.session.rollback()
+            status["outbox_solr"] = None
+        return status, 200
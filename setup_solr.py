@@ -1,63 +1,175 @@
-import requests
-import time
+import hashlib
+import json
 import os
 
+import requests
+
+from helpers.solr import solr
+
 CORE_NAME = os.getenv("CORE_NAME")
 SCHEMA_ENDPOINT = os.getenv("SCHEMA_ENDPOINT")
 STATUS_SOLR = os.getenv("STATUS_SOLR")
 
-def wait_for_solr():
-    """Espera o Solr estar online e o core 'cbo_core' estar pronto."""
-    print("Aguardando o Solr ficar disponível...")
-    while True:
-        try:
-            response = requests.get(STATUS_SOLR)
-            if response.status_code == 200 and CORE_NAME in response.json().get('status', {}):
-                print(f"Solr e Core '{CORE_NAME}' estão prontos.")
-                return
-        except requests.exceptions.ConnectionError:
-            pass # Solr ainda não respondeu, espera mais um pouco
-        time.sleep(5)
-
-def configure_solr_schema():
-    """Adiciona/modifica os campos necessários no schema."""
-    
-    # Lista de campos a serem configurados: '' e 
-    fields_to_configure = [
-        {
-            "name": "cod_cbo",
-            "type": "pint",    # Tipo inteiro (pint = primitive int)
-            "stored": True,    # O valor será retornado na busca
-            "indexed": True    # O valor será usado no índice invertido
+# Tipos de campo customizados, criados antes dos campos que os usam
+FIELD_TYPES = [
+    {
+        # Sugestões por prefixo: indexa os n-gramas iniciais de cada palavra, sem acentos
+        "name": "text_prefixo",
+        "class": "solr.TextField",
+        "positionIncrementGap": "100",
+        "indexAnalyzer": {
+            "tokenizer": {"class": "solr.StandardTokenizerFactory"},
+            "filters": [
+                {"class": "solr.LowerCaseFilterFactory"},
+                {"class": "solr.ASCIIFoldingFilterFactory"},
+                {"class": "solr.EdgeNGramFilterFactory", "minGramSize": "1", "maxGramSize": "25"}
+            ]
         },
-        {
-            "name": "titulo",
-            "type": "text_pt", # Usa o analisador de texto para português
-            "stored": True,     # O valor será retornado na busca
-            "indexed": True     # O valor será usado no índice invertido
+        "queryAnalyzer": {
+            "tokenizer": {"class": "solr.StandardTokenizerFactory"},
+            "filters": [
+                {"class": "solr.LowerCaseFilterFactory"},
+                {"class": "solr.ASCIIFoldingFilterFactory"}
+            ]
         }
-    ]
-
-    for field_config in fields_to_configure:
-        add_field_command = {"add-field": field_config}
-        field_name = field_config["name"]
-        
-        try:
-            response = requests.post(
-                SCHEMA_ENDPOINT,
-                json=add_field_command,
-                headers={'Content-Type': 'application/json'}
-            )
-            response.raise_for_status()
-            print(f"Campo '{field_name}' configurado com sucesso. Status: {response.json().get('responseHeader', {}).get('status')}")
-        except requests.exceptions.HTTPError as e:
-            # Se o campo já existir, Solr retorna 400. Isso é OK.
-            if "already exists" in response.text:
-                print(f"Campo '{field_name}' já existe. Continuando.")
-            else:
-                print(f"ERRO ao configurar o campo '{field_name}': {e}")
-                print(response.text)
-            
+    },
+    {
+        # Busca tolerante a acentos: 'tecnico' encontra 'Técnico', com stemming leve do português
+        "name": "text_ascii",
+        "class": "solr.TextField",
+        "positionIncrementGap": "100",
+        "analyzer": {
+            "tokenizer": {"class": "solr.StandardTokenizerFactory"},
+            "filters": [
+                {"class": "solr.LowerCaseFilterFactory"},
+                {"class": "solr.ASCIIFoldingFilterFactory"},
+                {"class": "solr.PortugueseLightStemFilterFactory"}
+            ]
+        }
+    }
+]
+
+# Campos a serem configurados
+FIELDS = [
+    {
+        "name": "cod_cbo",
+        "type": "pint",    # Tipo inteiro (pint = primitive int)
+        "stored": True,    # O valor será retornado na busca
+        "indexed": True    # O valor será usado no índice invertido
+    },
+    {
+        "name": "titulo",
+        "type": "text_pt", # Usa o analisador de texto para português
+        "stored": True,     # O valor será retornado na busca
+        "indexed": True     # O valor será usado no índice invertido
+    },
+    {
+        "name": "titulo_prefixo",
+        "type": "text_prefixo", # Preenchido via copyField a partir de 'titulo'
+        "stored": False,
+        "indexed": True
+    },
+    {
+        "name": "titulo_ascii",
+        "type": "text_ascii",   # Preenchido via copyField a partir de 'titulo'
+        "stored": False,
+        "indexed": True
+    },
+    {
+        "name": "hash_doc",
+        "type": "plong",        # Hash do conteúdo, somado por faixa na reconciliação
+        "stored": False,
+        "indexed": False,
+        "docValues": True       # Agregável no JSON Facet e lido via `fl`
+    }
+]
+
+COPY_FIELDS = [
+    {"source": "titulo", "dest": "titulo_prefixo"},
+    {"source": "titulo", "dest": "titulo_ascii"}
+]
+
+
+def solr_pronto() -> bool:
+    """Se o Solr está online e o core já foi carregado.
+
+    Sonda direta, fora do cliente compartilhado: o disjuntor e as retentativas
+    dele só atrasariam a espera, que já tem o próprio backoff.
+    """
+    response = requests.get(STATUS_SOLR, timeout=(1, 2))
+    return response.status_code == 200 and CORE_NAME in response.json().get('status', {})
+
+
+def impressao_schema() -> str:
+    """Hash do schema desejado; quando muda, os documentos já indexados ficam para trás."""
+    return hashlib.sha256(json.dumps([FIELD_TYPES, FIELDS, COPY_FIELDS], sort_keys=True).encode()).hexdigest()
+
+
+def _contem(atual, desejado) -> bool:
+    """Se a definição devolvida pelo Solr já tem todas as propriedades desejadas.
+
+    O Solr acrescenta propriedades padrão e pode devolver booleanos e números
+    como texto, então a comparação é por subconjunto e pelo valor em texto.
+    """
+    if isinstance(desejado, dict):
+        return isinstance(atual, dict) and all(_contem(atual.get(k), v) for k, v in desejado.items())
+    if isinstance(desejado, list):
+        return (isinstance(atual, list) and len(atual) == len(desejado)
+                and all(_contem(a, d) for a, d in zip(atual, desejado)))
+    return str(atual).lower() == str(desejado).lower()
+
+
+def comandos_schema(schema: dict) -> dict:
+    """Comandos da Schema API que levam o schema atual ao desejado.
+
+    Tipos e campos ausentes são adicionados e os divergentes substituídos;
+    copy fields só são adicionados (o Solr aceitaria duplicados). A ordem
+    das chaves importa: os tipos precisam existir antes dos campos que os usam.
+    """
+    comandos = {}
+
+    def diferenca(existentes, desejados, adicionar, substituir):
+        por_nome = {item["name"]: item for item in existentes}
+        for config in desejados:
+            atual = por_nome.get(config["name"])
+            if atual is None:
+                comandos.setdefault(adicionar, []).append(config)
+            elif not _contem(atual, config):
+                comandos.setdefault(substituir, []).append(config)
+
+    diferenca(schema.get("fieldTypes", []), FIELD_TYPES, "add-field-type", "replace-field-type")
+    diferenca(schema.get("fields", []), FIELDS, "add-field", "replace-field")
+
+    existentes = {(c["source"], c["dest"]) for c in schema.get("copyFields", [])}
+    novos = [c for c in COPY_FIELDS if (c["source"], c["dest"]) not in existentes]
+    if novos:
+        comandos["add-copy-field"] = novos
+    return comandos
+
+
+def configure_solr_schema() -> dict:
+    """Aplica no schema apenas o que falta ou mudou, em uma única requisição.
+
+    Retorna os comandos enviados (vazio quando o schema já está em dia).
+    """
+    response = solr.get(SCHEMA_ENDPOINT)
+    response.raise_for_status()
+    comandos = comandos_schema(response.json().get("schema", {}))
+    if not comandos:
+        print("Schema do Solr já está atualizado.")
+        return comandos
+
+    response = solr.post(SCHEMA_ENDPOINT, json=comandos, headers={'Content-Type': 'application/json'})
+    if not response.ok:
+        print(f"ERRO ao configurar o schema do Solr: {response.text}")
+    response.raise_for_status()
+    for comando, configs in comandos.items():
+        nomes = ", ".join(c.get("name") or f"{c['source']} -> {c['dest']}" for c in configs)
+        print(f"{comando}: {nomes}")
+    return comandos
+
+
 if __name__ == "__main__":
-    wait_for_solr()
-    configure_solr_schema()
\ No newline at end of file
+    from startup import aguardar, STARTUP_TIMEOUT
+    aguardar("Solr", solr_pronto, STARTUP_TIMEOUT)
+    configure_solr_schema()
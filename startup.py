@@ -0,0 +1,189 @@
+"""Inicialização do container: espera as dependências e prepara banco e Solr.
+
+Etapas, cada uma pulada quando não há nada a fazer:
+  1. espera o banco e o Solr em paralelo, com backoff exponencial e prazo total;
+  2. aplica as migrações pendentes;
+  3. aplica no schema do Solr só o que falta, em uma única requisição;
+  4. carrega o CSV e reindexa o Solr apenas se a impressão digital da carga
+     (hash do CSV e do schema + contagens no banco e no Solr) mudou desde a
+     última vez.
+
+Uso:
+    python startup.py [--forcar] [--prazo 120] [opções do init_db.py]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import flask_migrate
+from dotenv import load_dotenv
+
+from helpers.application import app
+from helpers.database import db
+from helpers.indexer import confirmar_indexacao
+from helpers.logging import log_exception
+from helpers.solr import solr
+
+from init_db import adicionar_argumentos, carregar_banco, indexar_solr
+from models.CBO import CBO
+from models.Metadado import Metadado
+from setup_solr import configure_solr_schema, impressao_schema, solr_pronto
+
+load_dotenv()
+
+# Prazo total (s) para banco e Solr ficarem disponíveis
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", 120))
+# Intervalo máximo (s) entre tentativas; começa em 0,1 s e dobra a cada falha
+STARTUP_MAX_BACKOFF = float(os.getenv("STARTUP_MAX_BACKOFF", 5))
+
+# Chave da impressão digital da carga em tb_metadados
+CHAVE_IMPRESSAO = "carga_csv"
+
+
+def aguardar(nome: str, verificar, prazo: float):
+    """Chama `verificar` com backoff exponencial até retornar True ou estourar o prazo (s)."""
+    limite = time.monotonic() + prazo
+    atraso = 0.1
+    tentativas = 0
+    erro = None
+    while True:
+        tentativas += 1
+        try:
+            if verificar():
+                print(f"{nome} disponível após {tentativas} tentativa(s).")
+                return
+            erro = None
+        except Exception as e:
+            # Ainda não respondeu; guarda o erro para a mensagem final
+            erro = e
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise TimeoutError(f"{nome} indisponível após {prazo:.0f}s" + (f": {erro}" if erro else ""))
+        time.sleep(min(atraso, restante))
+        atraso = min(atraso * 2, STARTUP_MAX_BACKOFF)
+
+
+def banco_pronto() -> bool:
+    with app.app_context():
+        with db.engine.connect() as conexao:
+            conexao.execute(db.text("SELECT 1"))
+    return True
+
+
+def impressao_csv(args) -> str:
+    """Hash do arquivo e das opções de leitura que afetam o que é carregado."""
+    h = hashlib.sha256()
+    h.update(f"{args.encoding}|{args.delimitador}|{args.coluna_codigo}|{args.coluna_titulo}".encode())
+    with open(args.arquivo, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def contar_banco() -> int:
+    return db.session.execute(db.select(db.func.count()).select_from(CBO)).scalar()
+
+
+def contar_solr() -> int:
+    return solr.select({"q": "*:*", "rows": 0})["response"]["numFound"]
+
+
+def ler_impressao() -> dict:
+    metadado = db.session.get(Metadado, CHAVE_IMPRESSAO)
+    return json.loads(metadado.valor) if metadado is not None else None
+
+
+def gravar_impressao(impressao: dict):
+    metadado = db.session.get(Metadado, CHAVE_IMPRESSAO)
+    if metadado is None:
+        metadado = Metadado(chave=CHAVE_IMPRESSAO)
+        db.session.add(metadado)
+    metadado.valor = json.dumps(impressao)
+    db.session.commit()
+
+
+def preparar_dados(args, schema_alterado: dict = None):
+    """Carrega o CSV e reindexa o Solr somente quando necessário.
+
+    - Banco: recarrega se o CSV (ou as opções de leitura) mudou desde a
+      última carga registrada, ou se tb_cbo está vazia.
+    - Solr: reindexa se o banco foi recarregado, se o schema acabou de
+      mudar (`schema_alterado`, os comandos enviados ao Solr) ou mudou desde
+      a última indexação concluída (ex.: um novo copy field só vale para
+      documentos reindexados), ou se a quantidade de documentos não bate com
+      a de linhas em tb_cbo (ex.: volume do Solr recriado). Alterações feitas
+      pela API chegam ao Solr pela outbox.
+    """
+    anterior = ler_impressao() or {}
+    csv_sha256 = impressao_csv(args)
+    schema_sha256 = impressao_schema()
+    cbos_banco = contar_banco()
+
+    carregar = args.forcar or anterior.get("csv_sha256") != csv_sha256 or cbos_banco == 0
+    if carregar:
+        print(f"Carregando {args.arquivo} em tb_cbo...")
+        linhas_csv = carregar_banco(args)
+        cbos_banco = contar_banco()
+    else:
+        linhas_csv = anterior.get("linhas_csv")
+        print(f"CSV inalterado desde a última carga ({cbos_banco} CBOs no banco); carga do banco pulada.")
+
+    documentos_solr = contar_solr()
+    schema_mudou = bool(schema_alterado) or anterior.get("schema_sha256") != schema_sha256
+    if carregar or schema_mudou or documentos_solr != cbos_banco:
+        motivo = " após mudança no schema" if schema_mudou and not carregar else ""
+        print(f"Reindexando o Solr{motivo} ({documentos_solr} documentos, {cbos_banco} CBOs no banco)...")
+        indexar_solr(args)
+        documentos_solr = contar_solr()
+    else:
+        print(f"Solr em dia ({documentos_solr} documentos); reindexação pulada.")
+
+    gravar_impressao({
+        "csv_sha256": csv_sha256,
+        "schema_sha256": schema_sha256,
+        "linhas_csv": linhas_csv,
+        "cbos_banco": cbos_banco,
+        "documentos_solr": documentos_solr
+    })
+    # Libera o cache das buscas no Solr para a versão carregada (se a outbox estiver vazia)
+    confirmar_indexacao()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepara banco e Solr na inicialização do container.")
+    adicionar_argumentos(parser)
+    parser.add_argument("--forcar", action="store_true", help="recarrega o banco e reindexa o Solr mesmo sem mudanças")
+    parser.add_argument("--prazo", type=float, default=STARTUP_TIMEOUT, help="segundos de espera pelo banco e pelo Solr")
+    args = parser.parse_args()
+    inicio = time.monotonic()
+
+    try:
+        # 1. Dependências: as duas esperas correm em paralelo
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            esperas = [executor.submit(aguardar, "Banco", banco_pronto, args.prazo),
+                       executor.submit(aguardar, "Solr", solr_pronto, args.prazo)]
+            for espera in esperas:
+                espera.result()
+
+        with app.app_context():
+            # 2. Migrações (no mesmo processo, sem subir outro interpretador)
+            flask_migrate.upgrade()
+
+            # 3. Schema do Solr
+            schema_alterado = configure_solr_schema()
+
+            # 4. Dados
+            preparar_dados(args, schema_alterado)
+    except Exception:
+        log_exception("Falha na inicialização")
+        sys.exit(1)
+
+    print(f"Inicialização concluída em {time.monotonic() - inicio:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()